@@ -0,0 +1,118 @@
+"""
+音声デコードユーティリティ
+アップロードされた音声をメモリ上でWhisper用のfloat32配列（モノラル・16kHz）に変換する
+"""
+
+import io
+import subprocess
+from math import gcd
+
+import numpy as np
+import scipy.io.wavfile as wavfile
+
+# Whisperが受け付けるサンプリングレート
+WHISPER_SAMPLE_RATE = 16000
+
+# ffmpegでデコードするコンテナ形式のマジックナンバー
+COMPRESSED_MAGIC = (
+    b"\x1a\x45\xdf\xa3",  # WebM / Matroska
+    b"OggS",              # Ogg (Opus/Vorbis)
+    b"fLaC",              # FLAC
+    b"ID3",               # MP3 (ID3タグ付き)
+    b"\xff\xfb",          # MP3 (フレーム先頭)
+    b"\xff\xf3",
+    b"\xff\xf2",
+)
+
+# 圧縮音声を表すContent-Type（これ以外で届いたヘッダなしデータはPCMとして扱い、先頭バイトで形式を推測しない）
+COMPRESSED_MIMETYPES = (
+    "audio/webm", "video/webm", "audio/ogg", "audio/opus",
+    "audio/mpeg", "audio/mp3", "audio/flac", "audio/x-flac",
+)
+
+
+def is_wav(audio_bytes):
+    """WAV (RIFF/WAVE) ヘッダを持つか"""
+    return len(audio_bytes) >= 12 and audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE"
+
+
+def is_compressed(audio_bytes):
+    """ffmpegでのデコードが必要な圧縮形式か"""
+    return audio_bytes.startswith(COMPRESSED_MAGIC)
+
+
+def is_compressed_mimetype(mimetype):
+    """Content-Typeが圧縮音声を明示しているか（application/octet-stream等は含まない）"""
+    return (mimetype or "").lower() in COMPRESSED_MIMETYPES
+
+
+def to_float32(samples):
+    """整数PCM/浮動小数点の配列を [-1.0, 1.0] のfloat32に正規化（モノラル化も行う）"""
+    if samples.dtype == np.int16:
+        audio = samples.astype(np.float32) * (1.0 / 32768.0)
+    elif samples.dtype == np.int32:
+        audio = samples.astype(np.float32) * (1.0 / 2147483648.0)
+    elif samples.dtype == np.uint8:
+        audio = (samples.astype(np.float32) - 128.0) * (1.0 / 128.0)
+    else:
+        audio = samples.astype(np.float32, copy=False)
+
+    # 多チャンネルはチャンネル平均でモノラルに
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1, dtype=np.float32)
+
+    return audio
+
+
+def resample(audio, orig_rate, target_rate=WHISPER_SAMPLE_RATE):
+    """ポリフェーズフィルタでリサンプリング"""
+    if orig_rate == target_rate or audio.size == 0:
+        return audio
+
+    # scipy.signalはimportに時間がかかるので、初めてリサンプリングするときに読み込む
+    from scipy.signal import resample_poly
+
+    divisor = gcd(int(orig_rate), int(target_rate))
+    up = int(target_rate) // divisor
+    down = int(orig_rate) // divisor
+    return resample_poly(audio, up, down).astype(np.float32, copy=False)
+
+
+def decode_with_ffmpeg(audio_bytes, target_rate=WHISPER_SAMPLE_RATE):
+    """圧縮音声をffmpegのパイプ入出力でデコード（一時ファイルなし）"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(target_rate),
+        "pipe:1",
+    ]
+    proc = subprocess.run(cmd, input=audio_bytes, capture_output=True, check=True)
+    return np.frombuffer(proc.stdout, dtype=np.int16)
+
+
+def decode_audio(audio_bytes, sample_rate=None, target_rate=WHISPER_SAMPLE_RATE, raw=False):
+    """
+    音声データ(バイナリ)をWhisper用のfloat32配列に変換する
+    audio_bytes: WAV / 圧縮音声(WebM, Ogg, MP3, FLAC) / ヘッダなしint16 PCM
+    sample_rate: ヘッダなしPCMのサンプリングレート（省略時はtarget_rate）
+    raw: ヘッダなしPCMだと分かっている（先頭のサンプルが圧縮形式のマジックナンバーと
+         同じバイト列でも圧縮音声として扱わない。WAVヘッダがあればWAVとして読む）
+    圧縮形式に見えてもffmpegでデコードできなければ（ffmpegがない場合も）、ヘッダなしPCMとして読む
+    """
+    if is_wav(audio_bytes):
+        rate, samples = wavfile.read(io.BytesIO(audio_bytes))
+    else:
+        samples = None
+        if not raw and is_compressed(audio_bytes):
+            try:
+                rate, samples = target_rate, decode_with_ffmpeg(audio_bytes, target_rate)
+            except (subprocess.CalledProcessError, OSError):
+                samples = None  # 先頭がたまたまマジックナンバーと一致したPCM・ffmpeg未インストール
+        if samples is None:
+            # ヘッダなしのint16 PCM（奇数バイトの端数は切り捨て）
+            usable = len(audio_bytes) - (len(audio_bytes) % 2)
+            rate = sample_rate or target_rate
+            samples = np.frombuffer(audio_bytes[:usable], dtype=np.int16)
+
+    audio = resample(to_float32(samples), rate, target_rate)
+    return np.ascontiguousarray(audio, dtype=np.float32)
@@ -0,0 +1,319 @@
+"""
+AIサービスのベンチマーク
+合成入力とローカルのスタブOllamaサーバーで主要な処理経路を計測し、結果をJSONで出力する
+
+使い方:
+  python benchmark.py                       # 全ケース
+  python benchmark.py --only vcam tracker   # 一部だけ
+  python benchmark.py --output result.json  # ファイルにも保存
+
+依存が足りないケース（Whisper未インストール等）は "skipped" として記録する
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from metrics import REGISTRY
+
+SAMPLE_RATE = 16000
+STUB_TOKENS = ["こんにちは", "。", "今日は", "いい天気", "ですね", "！"]
+
+
+def summarize(samples):
+    """処理時間（秒）の列を統計値（ミリ秒）にまとめる"""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "n": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "min_ms": round(float(values.min()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def load_module(name):
+    """
+    ケースで使うモジュールをそのケースの中で読み込む（依存が足りないケースだけskippedにできるように）
+    import時のログもstderrへ（stdoutはJSONだけにする）
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        return importlib.import_module(name)
+
+
+def measure(func, repeat, warmup=1):
+    """func()をwarmup回捨ててからrepeat回計測する"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def synthetic_speech(seconds, seed=0):
+    """音声の代わりの合成信号（母音っぽい倍音＋ノイズ、1秒ごとに無音を挟む）"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 0.5 * t) > -0.3).astype(np.float64)
+    audio = 0.3 * signal * envelope + 0.01 * rng.standard_normal(t.size)
+    return audio.astype(np.float32)
+
+
+# ===== スタブOllama =====
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """/api/generate・/api/chat・/api/tags だけを返す最小のOllama互換サーバー"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # ヘッダと本文が別パケットでも遅延ACKで待たされないように
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._send_json({"models": [{"name": "stub"}]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        chat = self.path.endswith("/chat")
+
+        def chunk(text, done):
+            if chat:
+                return {"model": "stub", "message": {"role": "assistant", "content": text}, "done": done}
+            return {"model": "stub", "response": text, "done": done}
+
+        if body.get("stream"):
+            lines = [chunk(token, False) for token in STUB_TOKENS] + [chunk("", True)]
+            data = b"".join(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n" for line in lines)
+            self._send(data, "application/x-ndjson")
+        else:
+            self._send_json(chunk("".join(STUB_TOKENS), True))
+
+    def _send_json(self, payload):
+        self._send(json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _send(self, data, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ===== ケース =====
+
+def bench_stt(repeat):
+    """stt_transcribe の実時間係数（処理時間 / 音声長）"""
+    try:
+        main = load_module("main")
+    except ImportError as e:
+        return {"skipped": str(e)}
+    if not main.WHISPER_AVAILABLE:
+        return {"skipped": "whisper is not installed"}
+    if not main.stt_worker and not main.init_whisper():
+        return {"skipped": "whisper initialization failed"}
+
+    result = {"model": main.CONFIG["stt"]["model"]}
+    for seconds in (2, 5, 10):
+        audio = synthetic_speech(seconds)
+        samples = measure(lambda: main.stt_transcribe(audio), repeat)
+        stats = summarize(samples)
+        stats["rtf"] = round(float(np.median(samples)) / seconds, 4)
+        result[f"{seconds}s"] = stats
+    return result
+
+
+def bench_llm(repeat):
+    """llm_generate / llm_generate_stream のHTTP往復オーバーヘッド（スタブOllama）"""
+    try:
+        main = load_module("main")
+    except ImportError as e:
+        return {"skipped": str(e)}
+    server = start_stub_ollama()
+    original_url = main.CONFIG["llm"]["url"]
+    main.CONFIG["llm"]["url"] = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        session_id = "benchmark"
+
+        def stream_first_token():
+            tokens = main.llm_generate_stream("こんにちは")
+            next(tokens)
+            tokens.close()
+
+        result = {
+            "generate": summarize(measure(lambda: main.llm_generate("こんにちは"), repeat)),
+            "generate_session": summarize(measure(lambda: main.llm_generate("こんにちは", session_id=session_id), repeat)),
+            "stream_first_token": summarize(measure(stream_first_token, repeat)),
+            "stream_total": summarize(measure(lambda: list(main.llm_generate_stream("こんにちは")), repeat)),
+        }
+        main.chat_sessions.reset(session_id)
+        return result
+    finally:
+        main.CONFIG["llm"]["url"] = original_url
+        server.shutdown()
+
+
+def bench_tts(repeat):
+    """tts_synthesize のレイテンシ（キャッシュミス / メモリキャッシュヒット）"""
+    try:
+        main = load_module("main")
+    except ImportError as e:
+        return {"skipped": str(e)}
+    if not main.tts_engine and not main.init_tts():
+        return {"skipped": "no TTS engine available"}
+
+    original_cache = main.tts_cache
+    try:
+        counter = iter(range(1_000_000))
+        main.tts_cache = None
+        miss = measure(lambda: main.tts_synthesize(f"ベンチマーク{next(counter)}番です。"), repeat)
+
+        main.tts_cache = main.TTSCache(max_memory_bytes=8 * 1024 * 1024)
+        hit = measure(lambda: main.tts_synthesize("ベンチマークです。"), repeat)
+
+        return {"engine": main.tts_engine.name, "miss": summarize(miss), "hit": summarize(hit)}
+    finally:
+        main.tts_cache = original_cache
+
+
+def bench_vcam(repeat):
+    """VirtualCamera のフレームデコード＋リサイズ性能（デコードワーカー1回分。出力デバイスは開かない）"""
+    try:
+        VirtualCamera = load_module("virtual_cam").VirtualCamera
+    except ImportError as e:
+        return {"skipped": str(e)}
+    camera = VirtualCamera()
+    rng = np.random.default_rng(0)
+    result = {"output": f"{camera.width}x{camera.height}"}
+
+    for width, height in ((640, 360), (1280, 720), (1920, 1080)):
+        # 実写に近い圧縮率になるよう、ノイズではなく滑らかなグラデーション＋少量のノイズ
+        gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        image = (gradient + rng.normal(0, 8, (height, width, 3))).clip(0, 255).astype(np.uint8)
+        _, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        data = jpeg.tobytes()
+
+        samples = measure(lambda: camera.decode_frame(data), repeat * 10)
+        stats = summarize(samples)
+        stats["fps"] = round(1.0 / float(np.mean(samples)), 1)
+        stats["jpeg_bytes"] = len(data)
+        result[f"{width}x{height}"] = stats
+    return result
+
+
+def bench_tracker(repeat):
+    """検出後の1フレーム分の処理（_send_pose_data + _process_face_from_pose + OSC送信）"""
+    try:
+        body_tracker = load_module("body_tracker")
+    except ImportError as e:
+        return {"skipped": str(e)}
+    # 出力ループは使わず、フレームごとに送る経路を計測する（送信先は使われないローカルポート）
+    tracker = body_tracker.BodyTracker(osc_port=39539, config={"output": {"rate": 0}})
+    rng = np.random.default_rng(0)
+    base = np.column_stack([rng.uniform(0.3, 0.7, (33, 2)), rng.uniform(-0.2, 0.2, 33), np.full(33, 0.95)])
+    img_w, img_h = 1280, 720
+    # 顔の点は3Dモデルを実際に投影した位置にする（PnPが現実的な条件で解けるように）
+    camera_matrix, dist_coeffs = tracker.head_pose.intrinsics(img_w, img_h)
+    face_2d, _ = cv2.projectPoints(
+        tracker.face_3d, np.array([0.1, 0.2, 0.0]), np.array([0.0, 0.0, 4000.0]), camera_matrix, dist_coeffs
+    )
+    base[body_tracker.PNP_INDICES, :2] = face_2d.reshape(-1, 2) / (img_w, img_h)
+
+    frames = repeat * 50
+    jitter = rng.normal(0, 0.001, (frames, 33, 4))
+    jitter[:, :, 3] = 0
+    state = {"i": 0, "t": time.perf_counter()}
+
+    def process_frame():
+        i = state["i"] % frames
+        state["i"] += 1
+        state["t"] += 1 / 30
+        points = (base + jitter[i]).astype(np.float32)
+        tracker.osc.begin_frame()
+        tracker._send_pose_data(points, None, state["t"])
+        tracker._process_face_from_pose(points, img_w, img_h, state["t"])
+        tracker.osc.send_frame()
+
+    samples = measure(process_frame, frames, warmup=10)
+    stats = summarize(samples)
+    stats["osc"] = tracker.osc.stats()
+    stats["head_pose"] = {"warm": tracker.head_pose.warm_solves, "cold": tracker.head_pose.cold_solves}
+    return stats
+
+
+BENCHMARKS = {
+    "stt": bench_stt,
+    "llm": bench_llm,
+    "tts": bench_tts,
+    "vcam": bench_vcam,
+    "tracker": bench_tracker,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, repeat):
+    results = {}
+    for name in names:
+        print(f"[BENCH] {name}...", file=sys.stderr)
+        try:
+            results[name] = BENCHMARKS[name](repeat)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+    return {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+        "stages": REGISTRY.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VRabater AI Service benchmark")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="結果のJSONを保存するファイル")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args.only, args.repeat)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
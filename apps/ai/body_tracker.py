@@ -5,7 +5,14 @@ import mediapipe as mp
 import threading
 import time
 import numpy as np
-from pythonosc import udp_client
+
+from filters import OneEuroFilter
+from frame_source import CameraSource, ReplaySource
+from head_pose import HeadPoseEstimator, rotation_to_euler
+from metrics import observe, timed
+from osc_output import OSCFrameSender
+from preview import PreviewEncoder
+from recording import RecordingWriter
 
 # MediaPipe Tasks API imports
 from mediapipe.tasks import python
@@ -14,16 +21,223 @@ from mediapipe.tasks.python import vision
 # Set environment variable for MediaPipe
 os.environ['MEDIAPIPE_DISABLE_GPU'] = '1'
 
+# MediaPipe running modes selectable by name
+RUNNING_MODES = {
+    "image": vision.RunningMode.IMAGE,
+    "video": vision.RunningMode.VIDEO,
+    "live_stream": vision.RunningMode.LIVE_STREAM,
+}
+
+# Default tracker settings (override per section with the `config` argument)
+DEFAULT_CONFIG = {
+    "running_mode": "live_stream",  # image / video / live_stream
+    "camera_ids": [0, 1, 2],
+    "capture": {
+        "width": None,     # e.g. 1280
+        "height": None,    # e.g. 720
+        "fps": None,       # e.g. 30
+        "fourcc": None,    # e.g. "MJPG"
+    },
+    "inference": {
+        "max_width": 640,           # downscale the inference input to this width (None = full resolution)
+        "roi": True,                # crop around the last detected person
+        "roi_margin": 0.3,          # margin around the person box, relative to its size
+        "roi_min_size": 0.25,       # minimum crop size, relative to the frame
+        "roi_min_visibility": 0.5,  # landmarks used for the person box
+    },
+    "skeleton": {
+        "coordinates": "image",     # image (normalized 0-1) / world (meters, hip-centered, y up)
+        "mirror": False,            # flip horizontally and swap left/right joints
+        "min_visibility": 0.5,      # joints below this visibility are not sent
+    },
+    "filter": {
+        "enabled": True,
+        "min_cutoff": 1.0,          # Hz; lower = smoother when still
+        "beta": 0.5,                # higher = less lag on fast moves (per unit/s)
+        "d_cutoff": 1.0,
+        "rotation_min_cutoff": 1.0,
+        "rotation_beta": 0.01,      # per degree/s
+    },
+    "output": {
+        "rate": 60,                 # Hz; OSC output rate independent of inference (0 = send per detection)
+        "max_prediction": 0.1,      # seconds the filter may extrapolate past the last detection
+        "hold_timeout": 0.5,        # stop sending when no detection for this long
+    },
+    "head_pose": {
+        "calibration": None,        # path to a calibration profile (JSON), None = estimated intrinsics
+    },
+    "preview": {
+        "enabled": False,           # JPEG preview for the /preview endpoint (encoded only while watched)
+        "fps": 10,
+        "quality": 70,
+        "max_width": 640,
+        "draw_landmarks": True,
+    },
+    "record": {
+        "path": None,               # record frames (JPEG) and landmark outputs to this file
+        "jpeg_quality": 90,
+        "frames": True,             # False = landmarks only
+    },
+    "replay": {
+        "path": None,               # play a recording instead of opening a camera (forces VIDEO mode)
+        "realtime": False,          # pace by the recorded timestamps instead of as fast as possible
+    },
+    "osc": {
+        "deadband": 0.002,          # normalized coordinates
+        "rotation_deadband": 0.2,   # degrees
+        "keyframe_interval": 1.0,   # seconds; unchanged values are re-sent this often
+    },
+}
+
+POSE_LANDMARK_COUNT = 33
+
+# Left/right landmark pairs of the pose model; used to swap sides when mirroring
+POSE_MIRROR_PAIRS = [
+    (1, 4), (2, 5), (3, 6), (7, 8), (9, 10), (11, 12), (13, 14), (15, 16),
+    (17, 18), (19, 20), (21, 22), (23, 24), (25, 26), (27, 28), (29, 30), (31, 32),
+]
+POSE_MIRROR_INDEX = np.arange(POSE_LANDMARK_COUNT)
+for _left, _right in POSE_MIRROR_PAIRS:
+    POSE_MIRROR_INDEX[_left], POSE_MIRROR_INDEX[_right] = _right, _left
+
+# Precomputed OSC addresses: (Gateway Part, Gateway Side, Pose Landmark Index)
+BODY_JOINTS = [
+    ('shoulder', 'left', 11),
+    ('shoulder', 'right', 12),
+    ('elbow', 'left', 13),
+    ('elbow', 'right', 14),
+    ('wrist', 'left', 15),
+    ('wrist', 'right', 16),
+    ('hip', 'left', 23),
+    ('hip', 'right', 24),
+    ('knee', 'left', 25),
+    ('knee', 'right', 26),
+    ('ankle', 'left', 27),
+    ('ankle', 'right', 28),
+]
+BODY_ADDRESSES = tuple(f"/body/{part}/{side}" for part, side, _ in BODY_JOINTS)
+BODY_INDICES = np.array([idx for _, _, idx in BODY_JOINTS])
+LEFT_WRIST = 15
+
+# Pose Landmarks used for head PnP: 0=Nose, 2=LEye, 5=REye, 9=LMouth, 10=RMouth
+PNP_INDICES = np.array([0, 2, 5, 9, 10])
+FACE_ROTATION_ADDRESS = "/face/rotation"
+FACE_BLINK_ADDRESS = "/face/blink"
+FACE_MOUTH_ADDRESS = "/face/mouth"
+FACE_EYE_ADDRESS = "/face/eye"
+
+
+def _to_unix_time(perf_time):
+    """Convert a time.perf_counter() value to Unix time (for OSC bundle time tags)"""
+    return time.time() - (time.perf_counter() - perf_time)
+
+
+def landmarks_to_array(landmarks):
+    """Convert a MediaPipe landmark list into a (33, 4) float32 array of [x, y, z, visibility]"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility or 0.0) for lm in landmarks],
+        dtype=np.float32
+    )
+
+
+def compute_roi(points, img_w, img_h, margin, min_size, min_visibility):
+    """Pixel crop (x0, y0, w, h) around the visible landmarks of the last frame, or None"""
+    visible = points[:, 3] >= min_visibility
+    if np.count_nonzero(visible) < 4:
+        return None
+
+    xy = points[visible, :2]
+    lo = xy.min(axis=0)
+    hi = xy.max(axis=0)
+    center = (lo + hi) / 2
+    size = np.maximum((hi - lo) * (1.0 + 2.0 * margin), min_size)
+
+    lo = np.clip(center - size / 2, 0.0, 1.0) * (img_w, img_h)
+    hi = np.clip(center + size / 2, 0.0, 1.0) * (img_w, img_h)
+    x0, y0 = int(lo[0]), int(lo[1])
+    x1, y1 = int(np.ceil(hi[0])), int(np.ceil(hi[1]))
+    if x1 - x0 < 16 or y1 - y0 < 16:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def roi_to_frame(points, roi, img_w, img_h):
+    """Map landmarks normalized to a crop back to full-frame normalized coordinates (in place)"""
+    x0, y0, roi_w, roi_h = roi
+    points[:, 0] = (points[:, 0] * roi_w + x0) / img_w
+    points[:, 1] = (points[:, 1] * roi_h + y0) / img_h
+    # z shares the x scale
+    points[:, 2] *= roi_w / img_w
+    return points
+
+
+def merge_config(defaults, overrides):
+    """Merge `overrides` into a copy of `defaults`, one level of nested sections deep"""
+    merged = {key: dict(value) if isinstance(value, dict) else value for key, value in defaults.items()}
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key].update(value)
+        else:
+            merged[key] = value
+    return merged
+
 class BodyTracker:
-    def __init__(self, osc_host="127.0.0.1", osc_port=11574):
+    def __init__(self, osc_host="127.0.0.1", osc_port=11574, running_mode=None, config=None):
         self.osc_host = osc_host
         self.osc_port = osc_port
-        self.osc_client = udp_client.SimpleUDPClient(osc_host, osc_port)
+        self.config = merge_config(DEFAULT_CONFIG, config)
+        osc_config = self.config["osc"]
+        self.osc = OSCFrameSender(osc_host, osc_port, osc_config["deadband"], osc_config["keyframe_interval"])
+        self.rotation_deadband = osc_config["rotation_deadband"]
+        skeleton_config = self.config["skeleton"]
+        self.use_world_coordinates = skeleton_config["coordinates"] == "world"
+        self.mirror = skeleton_config["mirror"]
+        self.min_visibility = skeleton_config["min_visibility"]
+        self._last_points = None
+        running_mode = running_mode or self.config["running_mode"]
+        if self.config["replay"]["path"] and running_mode == "live_stream":
+            # LIVE_STREAM drops frames depending on timing; replays must be repeatable
+            running_mode = "video"
+        self.inference = self.config["inference"]
+        
+        # Temporal filtering between detection and output
+        filter_config = self.config["filter"]
+        self.body_filter = None
+        self.rotation_filter = None
+        if filter_config["enabled"]:
+            self.body_filter = OneEuroFilter(filter_config["min_cutoff"], filter_config["beta"], filter_config["d_cutoff"])
+            self.rotation_filter = OneEuroFilter(
+                filter_config["rotation_min_cutoff"], filter_config["rotation_beta"], filter_config["d_cutoff"], period=360.0
+            )
+        
+        # Fixed-rate output (upsampled from the inference rate by filter prediction)
+        output_config = self.config["output"]
+        self.output_rate = output_config["rate"]
+        self.max_prediction = output_config["max_prediction"]
+        self.hold_timeout = output_config["hold_timeout"]
+        self.output_thread = None
+        self._output_lock = threading.Lock()
+        self._body_positions = None   # latest filtered joint positions (n, 3)
+        self._body_visible = None     # latest visibility mask (n,)
+        self._head_rotation = None    # latest filtered (pitch, yaw, roll)
+        self._last_measurement = None # perf_counter time of the latest detection
         
-        self.cap = None
+        self.source = None  # CameraSource (latest-frame capture thread)
         self.running = False
         self.thread = None
         
+        # Pipelining state (LIVE_STREAM): one detection in flight while the next frame is captured
+        self.running_mode = running_mode
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = {}  # timestamp_ms -> (capture_time, img_w, img_h, roi, submit_time)
+        self._pending_lock = threading.Lock()
+        self._last_timestamp_ms = -1
+        self._stats_lock = threading.Lock()
+        self._frame_count = 0
+        self._latency_sum = 0.0
+        self._stats_start = time.time()
+        
         # Paths to models
         base_path = os.path.dirname(os.path.abspath(__file__))
         pose_model_path = os.path.join(base_path, "models", "pose_landmarker.task")
@@ -34,12 +248,14 @@ class BodyTracker:
         # Init Pose Landmarker
         try:
             print("[INFO] Tracker v2 Starting... (Coordinate Logging Enabled)")
+            mode = RUNNING_MODES[running_mode]
             pose_options = vision.PoseLandmarkerOptions(
                 base_options=python.BaseOptions(model_asset_path=pose_model_path),
-                running_mode=vision.RunningMode.IMAGE
+                running_mode=mode,
+                result_callback=self._on_pose_result if mode == vision.RunningMode.LIVE_STREAM else None
             )
             self.pose_landmarker = vision.PoseLandmarker.create_from_options(pose_options)
-            print("[OK] PoseLandmarker initialized (Face Priority via Pose)")
+            print(f"[OK] PoseLandmarker initialized (Face Priority via Pose, mode={running_mode})")
         except Exception as e:
             print(f"[ERROR] PoseLandmarker Init Error: {e}")
             self.pose_landmarker = None
@@ -53,6 +269,21 @@ class BodyTracker:
             (-150.0, -150.0, -125.0),    # Left Mouth (9)
             (150.0, -150.0, -125.0)      # Right Mouth (10)
         ], dtype=np.float64)
+        self.head_pose = HeadPoseEstimator(self.face_3d, self.config["head_pose"]["calibration"])
+        
+        # Optional recording of the input frames and landmark outputs
+        record_config = self.config["record"]
+        self.recorder = None
+        if record_config["path"]:
+            self.recorder = RecordingWriter(record_config["path"], record_config["jpeg_quality"], record_config["frames"])
+        
+        # Optional camera preview (encoded off the tracking thread)
+        preview_config = self.config["preview"]
+        self.preview = None
+        if preview_config["enabled"]:
+            self.preview = PreviewEncoder(
+                preview_config["fps"], preview_config["quality"], preview_config["max_width"], preview_config["draw_landmarks"]
+            )
     
     def start(self):
         """Start camera and tracking."""
@@ -60,184 +291,335 @@ class BodyTracker:
             print("[WARN] Already running")
             return True
         
+        replay = self.config["replay"]
+        if replay["path"]:
+            source = ReplaySource(replay["path"], replay["realtime"])
+            if not source.open():
+                return False
+            self.source = source
+            self._start_threads()
+            return True
+        
         # Try camera IDs 0, 1, 2 (User requested revert to original)
-        for cam_id in [0, 1, 2]:
+        # The first camera that delivers a frame stays open for the tracking loop
+        capture = self.config["capture"]
+        for cam_id in self.config["camera_ids"]:
             print(f"SEARCH Checking camera ID {cam_id}...")
-            self.cap = cv2.VideoCapture(cam_id)
-            if self.cap.isOpened():
-                ret, frame = self.cap.read()
-                if ret:
-                    print(f"[OK] Camera opened successfully (ID: {cam_id})")
-                    self.camera_id = cam_id
-                    self.cap.release() # Release so tracking loop can open it
-                    self.running = True
-                    self.thread = threading.Thread(target=self._tracking_loop, daemon=True)
-                    self.thread.start()
-                    return True
-                else:
-                    self.cap.release()
+            source = CameraSource(cam_id, capture["width"], capture["height"], capture["fps"], capture["fourcc"])
+            if source.open():
+                print(f"[OK] Camera opened successfully (ID: {cam_id})")
+                self.camera_id = cam_id
+                self.source = source
+                self._start_threads()
+                return True
             
         print("[ERROR] Could not find any working camera.")
         return False
     
+    def _start_threads(self):
+        self.running = True
+        if self.recorder:
+            self.recorder.open({"running_mode": self.running_mode, "replay": self.config["replay"]["path"]})
+        if self.preview:
+            self.preview.start()
+        self.thread = threading.Thread(target=self._tracking_loop, daemon=True)
+        self.thread.start()
+        if self.output_rate:
+            self.output_thread = threading.Thread(target=self._output_loop, daemon=True)
+            self.output_thread.start()
+    
     def stop(self):
         """Stop tracking"""
         self.running = False
         if self.thread:
             self.thread.join(timeout=2.0)
-        if self.cap:
-            self.cap.release()
+        if self.output_thread:
+            self.output_thread.join(timeout=1.0)
+        if self.preview:
+            self.preview.stop()
+        if self.recorder:
+            self.recorder.close()
+        if self.source:
+            self.source.close()
         print("[STOP] Camera stopped")
     
     def _tracking_loop(self):
         print(f"[INFO] Tracker started.")
-        self.cap = cv2.VideoCapture(self.camera_id)
         
-        # FPS Calculation
-        frame_count = 0
-        start_time = time.time()
-
         while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
-                print("[WARN] Camera frame empty. Retrying...")
-                time.sleep(0.5)
+            if self.running_mode == "live_stream":
+                # Adaptive pacing: submit only once the previous detection has delivered its result.
+                # The capture thread keeps grabbing meanwhile, so the next read is the freshest frame.
+                if not self._idle.wait(timeout=1.0):
+                    print("[WARN] Pose detection timed out, resubmitting")
+
+            frame, capture_time = self.source.read(timeout=1.0)
+            if frame is None:
+                if self.source.finished:
+                    print("[OK] Replay finished")
+                    self.running = False
+                    break
+                print("[WARN] No camera frame. Waiting...")
                 continue
+            if self.recorder:
+                self.recorder.write_frame(frame, capture_time)
 
             try:
-                # To improve performance, optionally mark the image as not writeable to
-                # pass by reference.
-                frame.flags.writeable = False
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # 1. Body Tracking (Pose) - NOW INCLUDES FACE APPROX
-                pose_result = None
-                if self.pose_landmarker:
-                    pose_result = self.pose_landmarker.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame))
-
-                frame.flags.writeable = True
-                # frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR) # Not needed if we don't display
+                if not self.pose_landmarker:
+                    time.sleep(0.1)
+                    continue
 
                 img_h, img_w, _ = frame.shape
-
-                if pose_result and pose_result.pose_landmarks:
-                    landmarks = pose_result.pose_landmarks[0]
-                    # Process Body
-                    self._send_pose_data(landmarks) # Renamed from _process_body_pose to match existing
-                    
-                    # Process Face
-                    self._process_face_from_pose(landmarks, img_w, img_h)
-                    
-                    # FPS/Status Log (Every 30 frames ~ 1 sec)
-                    frame_count += 1
-                    if frame_count % 30 == 0:
-                        elapsed = time.time() - start_time
-                        fps = frame_count / elapsed
-                        print(f"[STATUS] FPS: {fps:.1f} | Tracking Active")
-                        frame_count = 0
-                        start_time = time.time()
-                    
+                with timed("tracker_convert"):
+                    rgb_frame, roi = self._prepare_input(frame)
+                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+                
+                # 1. Body Tracking (Pose) - NOW INCLUDES FACE APPROX
+                if self.running_mode == "live_stream":
+                    timestamp_ms = self._next_timestamp_ms(self.source.frame_time)
+                    with self._pending_lock:
+                        self._pending[timestamp_ms] = (capture_time, img_w, img_h, roi, time.perf_counter())
+                    self._idle.clear()
+                    self.pose_landmarker.detect_async(mp_image, timestamp_ms)
+                elif self.running_mode == "video":
+                    with timed("tracker_detect"):
+                        pose_result = self.pose_landmarker.detect_for_video(mp_image, self._next_timestamp_ms(self.source.frame_time))
+                    self._handle_pose_result(pose_result, capture_time, img_w, img_h, roi)
                 else:
-                    # If no pose is detected
-                    frame_count += 1
-                    if frame_count % 30 == 0:
-                        elapsed = time.time() - start_time
-                        fps = frame_count / elapsed
-                        print(f"[STATUS] FPS: {fps:.1f} | Searching for body...")
-                        frame_count = 0
-                        start_time = time.time()
+                    with timed("tracker_detect"):
+                        pose_result = self.pose_landmarker.detect(mp_image)
+                    self._handle_pose_result(pose_result, capture_time, img_w, img_h, roi)
 
             except Exception as e:
                 print(f"[ERROR] Tracking loop error: {e}")
+                self._idle.set()
                 # Simple retry logic (optional, but keep it minimal)
                 time.sleep(1.0)
                 import traceback
                 traceback.print_exc()
             else:
-                 # Debug: Save snapshot to web public folder to verify camera view
-                 if frame_count % 60 == 0:
-                     try:
-                         snap_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web", "public", "snap.jpg"))
-                         cv2.imwrite(snap_path, frame)
-                         print(f"[DEBUG] Snapshot saved to: {snap_path}")
-                     except Exception as e:
-                         print(f"[ERROR] Failed to save snapshot: {e}")
-
-            # CPU performance control
-            time.sleep(0.01)
-
-    def _send_pose_data(self, landmarks):
-        """Extract landmarks and send via OSC"""
-        # Map: BodyTracker Key -> (Gateway Part, Gateway Side)
-        landmark_map = {
-            'left_shoulder': ('shoulder', 'left', 11),
-            'right_shoulder': ('shoulder', 'right', 12),
-            'left_elbow': ('elbow', 'left', 13),
-            'right_elbow': ('elbow', 'right', 14),
-            'left_wrist': ('wrist', 'left', 15),
-            'right_wrist': ('wrist', 'right', 16),
-            # Add hips/knees if needed, assuming Gateway supports them
-            # 'left_hip': ('hip', 'left', 23),
-            # 'right_hip': ('hip', 'right', 24),
-        }
-        
-        for key, (part, side, idx) in landmark_map.items():
-            lm = landmarks[idx]
-            # Send /body/{part}/{side} x y z
-            self.osc_client.send_message(f"/body/{part}/{side}", [float(lm.x), float(lm.y), float(lm.z)])
+                if self.preview:
+                    self.preview.publish(frame, self._last_points)
+
+    def _prepare_input(self, frame):
+        """Crop around the last person (ROI), downscale and convert to RGB.
+
+        Returns (rgb_image, roi); roi is (x0, y0, w, h) in frame pixels. Without a
+        previous detection the whole frame is searched.
+        """
+        img_h, img_w = frame.shape[:2]
+        roi = None
+        if self.inference["roi"] and self._last_points is not None:
+            roi = compute_roi(
+                self._last_points, img_w, img_h,
+                self.inference["roi_margin"], self.inference["roi_min_size"], self.inference["roi_min_visibility"]
+            )
+        if roi is None:
+            roi = (0, 0, img_w, img_h)
+
+        x0, y0, roi_w, roi_h = roi
+        image = frame[y0:y0 + roi_h, x0:x0 + roi_w]
+
+        # Resize before the color conversion so both run on the smaller image
+        max_width = self.inference["max_width"]
+        if max_width and roi_w > max_width:
+            scale = max_width / roi_w
+            image = cv2.resize(image, (max_width, max(1, int(roi_h * scale))), interpolation=cv2.INTER_AREA)
+
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), roi
+
+    def _next_timestamp_ms(self, frame_time):
+        """Strictly increasing timestamp required by VIDEO/LIVE_STREAM modes (from the frame's capture time)"""
+        timestamp_ms = int(frame_time * 1000)
+        if timestamp_ms <= self._last_timestamp_ms:
+            timestamp_ms = self._last_timestamp_ms + 1
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    def _on_pose_result(self, pose_result, output_image, timestamp_ms):
+        """LIVE_STREAM result callback (runs on MediaPipe's thread)"""
+        try:
+            with self._pending_lock:
+                pending = self._pending.pop(timestamp_ms, None)
+                # Forget frames MediaPipe dropped without a callback
+                for stale in [ts for ts in self._pending if ts < timestamp_ms]:
+                    del self._pending[stale]
+            if pending is not None:
+                capture_time, img_w, img_h, roi, submit_time = pending
+                observe("tracker_detect", time.perf_counter() - submit_time)
+                self._handle_pose_result(pose_result, capture_time, img_w, img_h, roi)
+        except Exception as e:
+            print(f"[ERROR] Pose result callback error: {e}")
+        finally:
+            self._idle.set()
+
+    def _handle_pose_result(self, pose_result, capture_time, img_w, img_h, roi=None):
+        tracking = bool(pose_result and pose_result.pose_landmarks)
+        if not tracking:
+            # Lost: search the full frame next time
+            self._last_points = None
+            if self.recorder:
+                self.recorder.write_landmarks(capture_time, None)
+        else:
+            # All 33 landmarks as one array; every later stage works on arrays
+            points = landmarks_to_array(pose_result.pose_landmarks[0])
+            if roi is not None:
+                roi_to_frame(points, roi, img_w, img_h)
+            world_points = None
+            if self.use_world_coordinates and pose_result.pose_world_landmarks:
+                world_points = landmarks_to_array(pose_result.pose_world_landmarks[0])
+            self._last_points = points
+            if self.recorder:
+                self.recorder.write_landmarks(capture_time, points)
+
+            # Without the fixed-rate output loop: one OSC bundle per frame, stamped with the capture time
+            if not self.output_rate:
+                self.osc.begin_frame(_to_unix_time(capture_time))
+
+            # Process Body
+            self._send_pose_data(points, world_points, capture_time) # Renamed from _process_body_pose to match existing
+            
+            # Process Face
+            self._process_face_from_pose(points, img_w, img_h, capture_time)
+
+            if not self.output_rate:
+                self.osc.send_frame()
+
+        self._report_status(tracking, time.perf_counter() - capture_time)
+
+    def _report_status(self, tracking, latency):
+        """FPS/Status Log (Every 30 frames ~ 1 sec)"""
+        observe("tracker_latency", latency)
+        with self._stats_lock:
+            self._frame_count += 1
+            self._latency_sum += latency
+            if self._frame_count % 30 != 0:
+                return
+            elapsed = time.time() - self._stats_start
+            fps = self._frame_count / elapsed
+            avg_latency_ms = self._latency_sum / self._frame_count * 1000
+            self._frame_count = 0
+            self._latency_sum = 0.0
+            self._stats_start = time.time()
+
+        status = "Tracking Active" if tracking else "Searching for body..."
+        dropped = self.source.dropped_frames if self.source else 0
+        print(f"[STATUS] FPS: {fps:.1f} | Latency: {avg_latency_ms:.1f}ms | Dropped: {dropped} | {status}")
 
         # Log coordinates occasionally for debugging
-        left_wrist = landmarks[15]
-        print(f"[COORD] L-Wrist: ({left_wrist.x:.2f}, {left_wrist.y:.2f}, {left_wrist.z:.2f})")
+        if tracking and self._last_points is not None:
+            x, y, z, _ = self._last_points[LEFT_WRIST]
+            print(f"[COORD] L-Wrist: ({x:.2f}, {y:.2f}, {z:.2f})")
 
-    def _process_face_from_pose(self, landmarks, img_w, img_h):
-        """Estimate head rotation using Pose Landmarks (0-10)"""
-        # Pose Landmarks: 0=Nose, 2=LEye, 5=REye, 9=LMouth, 10=RMouth
-        pnp_indices = [0, 2, 5, 9, 10]
-        
-        face_2d = []
-        for idx in pnp_indices:
-            lm = landmarks[idx]
-            face_2d.append([lm.x * img_w, lm.y * img_h])
+    def skeleton_points(self, points, world_points=None):
+        """Apply coordinate conversion and mirroring to a (33, 4) landmark array"""
+        if world_points is not None:
+            # World landmarks: meters around the hip center, y pointing down -> flip to y up
+            skeleton = world_points * np.array([1.0, -1.0, 1.0, 0.0], dtype=np.float32)
+            skeleton[:, 3] = points[:, 3]
+            if self.mirror:
+                skeleton[:, 0] *= -1.0
+        else:
+            skeleton = points.copy()
+            if self.mirror:
+                skeleton[:, 0] = 1.0 - skeleton[:, 0]
+
+        if self.mirror:
+            skeleton = skeleton[POSE_MIRROR_INDEX]
+        return skeleton
+
+    def _send_pose_data(self, points, world_points=None, timestamp=None):
+        """Filter all body joints and queue them for output (points: (33, 4) landmark array)"""
+        joints = self.skeleton_points(points, world_points)[BODY_INDICES]
         
-        face_2d = np.array(face_2d, dtype=np.float64)
+        # Confidence gating: occluded joints keep their last value on the receiver side
+        visible = joints[:, 3] >= self.min_visibility
+        positions = joints[:, :3]
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+
+        with self._output_lock:
+            if self._last_measurement is not None and timestamp - self._last_measurement > self.hold_timeout:
+                # Tracking was lost: don't smooth or predict from the old pose
+                if self.body_filter:
+                    self.body_filter.reset()
+                    self.rotation_filter.reset()
+                self.head_pose.reset()
+            if self.body_filter:
+                positions = self.body_filter(positions, timestamp, visible)
+            self._body_positions = positions
+            self._body_visible = visible
+            self._last_measurement = timestamp
+
+        if self.output_rate:
+            return  # sent by the output loop
         
-        focal_length = img_w
-        cam_matrix = np.array([
-            [focal_length, 0, img_h / 2],
-            [0, focal_length, img_w / 2],
-            [0, 0, 1]
-        ], dtype=np.float64)
+        # /body/{part}/{side} x y z
+        self.osc.add_many(BODY_ADDRESSES, positions, visible)
+
+    def _output_loop(self):
+        """Send the filtered (and predicted) pose at a fixed rate, independent of inference FPS"""
+        period = 1.0 / self.output_rate
+        next_tick = time.perf_counter()
+
+        while self.running:
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()  # fell behind: skip ticks instead of bursting
+
+            now = time.perf_counter()
+            with self._output_lock:
+                if self._last_measurement is None or now - self._last_measurement > self.hold_timeout:
+                    continue
+                if self.body_filter:
+                    positions = self.body_filter.predict(now, self.max_prediction)
+                    rotation = self.rotation_filter.predict(now, self.max_prediction)
+                else:
+                    positions = self._body_positions
+                    rotation = self._head_rotation
+                visible = self._body_visible
+
+            try:
+                self.osc.begin_frame(_to_unix_time(now))
+                self.osc.add_many(BODY_ADDRESSES, positions, visible)
+                if rotation is not None:
+                    self.osc.add(FACE_ROTATION_ADDRESS, rotation, deadband=self.rotation_deadband)
+                self._queue_face_resets()
+                self.osc.send_frame()
+            except Exception as e:
+                print(f"[ERROR] OSC output error: {e}")
+
+    def _queue_face_resets(self):
+        # Reset Face expression for safety (sent only when the state changes)
+        self.osc.add_state(FACE_BLINK_ADDRESS, (0.0,))
+        self.osc.add_state(FACE_MOUTH_ADDRESS, (0.0, 0.0))
+        self.osc.add_state(FACE_EYE_ADDRESS, (0.0, 0.0))
+
+    def _process_face_from_pose(self, points, img_w, img_h, timestamp=None):
+        """Estimate head rotation using Pose Landmarks (0-10)"""
+        face_2d = points[PNP_INDICES, :2].astype(np.float64) * (img_w, img_h)
         
-        dist_coeffs = np.zeros((4, 1), dtype=np.float64)
-        success, rot_vec, trans_vec = cv2.solvePnP(self.face_3d, face_2d, cam_matrix, dist_coeffs, flags=cv2.SOLVEPNP_EPNP)
+        # Warm-started from the previous frame, cold EPnP fallback on divergence
+        with timed("tracker_pnp"):
+            pose = self.head_pose.solve(face_2d, img_w, img_h)
         
-        if success:
-            rmat, _ = cv2.Rodrigues(rot_vec)
-            # Manual Rotation Matrix to Euler Angles conversion
-            sy = np.sqrt(rmat[0,0] * rmat[0,0] + rmat[1,0] * rmat[1,0])
-            singular = sy < 1e-6
-            if not singular:
-                x = np.arctan2(rmat[2,1], rmat[2,2])
-                y = np.arctan2(-rmat[2,0], sy)
-                z = np.arctan2(rmat[1,0], rmat[0,0])
-            else:
-                x = np.arctan2(-rmat[1,2], rmat[1,1])
-                y = np.arctan2(-rmat[2,0], sy)
-                z = 0
+        if pose is not None:
+            rot_vec, _ = pose
+            rotation = rotation_to_euler(rot_vec)  # (pitch, yaw, roll) in degrees
             
-            # Convert to degrees for easier debugging and likely receiver expectation
-            pitch = x * (180.0 / np.pi)
-            yaw = y * (180.0 / np.pi)
-            roll = z * (180.0 / np.pi)
-            
-            self.osc_client.send_message("/face/rotation", [float(pitch), float(yaw), float(roll)])
-            print(f"[DEBUG] Face Rot: P={pitch:.2f}, Y={yaw:.2f}, R={roll:.2f}")
+            timestamp = time.perf_counter() if timestamp is None else timestamp
+            with self._output_lock:
+                if self.rotation_filter:
+                    rotation = self.rotation_filter(rotation, timestamp)
+                self._head_rotation = rotation
+
+            if not self.output_rate:
+                self.osc.add(FACE_ROTATION_ADDRESS, rotation, deadband=self.rotation_deadband)
 
-        # Reset Face expression for safety
-        self.osc_client.send_message("/face/blink", 0.0)
-        self.osc_client.send_message("/face/mouth", [0.0, 0.0])
-        self.osc_client.send_message("/face/eye", [0.0, 0.0])
+        if not self.output_rate:
+            self._queue_face_resets()
 
     # ---------------------------------------------------------
     # ERROR HANDLING UNCOMMENTED
@@ -0,0 +1,82 @@
+"""
+会話セッション管理
+セッションIDごとに会話履歴を保持し、Ollama /api/chat に渡すメッセージ列を組み立てる
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ChatSession:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.history = []  # [{"role": "user"|"assistant", "content": str}, ...]
+        self.last_used = time.monotonic()
+
+
+class ChatSessionStore:
+    def __init__(self, max_sessions=32, max_turns=10, ttl=1800.0):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def build_messages(self, session_id, prompt, system_prompt=None):
+        """システムプロンプト + 履歴 + 今回の発話 のメッセージ列を返す"""
+        with self.lock:
+            session = self._get(session_id)
+            history = list(session.history)
+
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def append_turn(self, session_id, prompt, reply):
+        """1往復分を履歴に追加し、上限を超えたら古い方から削る"""
+        with self.lock:
+            session = self._get(session_id)
+            session.history.append({"role": "user", "content": prompt})
+            session.history.append({"role": "assistant", "content": reply})
+
+            # 先頭が毎ターン変わるとOllamaのプロンプトキャッシュが効かないため、
+            # 上限を超えたら半分まとめて削る
+            if len(session.history) > self.max_turns * 2:
+                keep = max(1, self.max_turns // 2) * 2
+                session.history = session.history[-keep:]
+
+    def reset(self, session_id):
+        """セッションを破棄する。存在したらTrue"""
+        with self.lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self.lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+    def _get(self, session_id):
+        """セッションを取得（なければ作成）。lock内で呼ぶ"""
+        now = time.monotonic()
+
+        # 期限切れのセッションを掃除（古い順に並んでいる）
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ChatSession(session_id)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+
+        session.last_used = now
+        return session
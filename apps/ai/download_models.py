@@ -24,8 +24,10 @@ Whisperモデル:
   初回実行時に自動ダウンロードされます
   サイズ: tiny(39MB), base(74MB), small(244MB)
 
-Piperモデル（日本語TTS）:
-  将来実装予定
+Piperモデル（オフラインTTS）:
+  音声モデル(.onnx)と設定(.onnx.json)を models/piper/ に置き、
+  main.py の CONFIG["tts"]["engine"] を "piper" にしてください
+  （models/piper/voice.onnx, voice.onnx.json）
 
 実行するには:
   1. Ollamaをインストール: https://ollama.ai
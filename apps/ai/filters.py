@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+
+
+def _smoothing_factor(dt, cutoff):
+    """Exponential smoothing factor for a given cutoff frequency (works on arrays)"""
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """Vectorized One-Euro filter (Casiez et al.) with velocity-based prediction.
+
+    Filters an array of any shape element-wise. Slow movements get a low cutoff
+    (little jitter), fast movements a higher one (little lag). The filtered
+    velocity is kept so predict() can extrapolate between measurements.
+    With period set (e.g. 360 for degrees), values are treated as angles and
+    filtered across the wrap-around.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, period=None):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.x_prev = None
+        self.dx_prev = None
+        self.t_prev = None
+
+    def __call__(self, x, t, mask=None):
+        """Filter measurement x taken at time t (seconds). Rows where mask is False keep their state."""
+        x = np.asarray(x, dtype=np.float64)
+
+        if self.x_prev is None:
+            self.x_prev = x.copy()
+            self.dx_prev = np.zeros_like(x)
+            self.t_prev = t
+            return self._wrap(self.x_prev.copy())
+
+        dt = t - self.t_prev
+        if dt <= 0:
+            return self._wrap(self.x_prev.copy())
+
+        if self.period is not None:
+            # Move the measurement next to the previous value so 179 -> -179 is a 2 degree step
+            x = self.x_prev + self._wrap(x - self.x_prev)
+
+        dx = (x - self.x_prev) / dt
+        dx_hat = self.dx_prev + _smoothing_factor(dt, self.d_cutoff) * (dx - self.dx_prev)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        x_hat = self.x_prev + _smoothing_factor(dt, cutoff) * (x - self.x_prev)
+
+        if mask is not None:
+            x_hat = np.where(mask[:, None], x_hat, self.x_prev) if x_hat.ndim == 2 else np.where(mask, x_hat, self.x_prev)
+            dx_hat = np.where(mask[:, None], dx_hat, self.dx_prev) if dx_hat.ndim == 2 else np.where(mask, dx_hat, self.dx_prev)
+
+        self.x_prev = x_hat
+        self.dx_prev = dx_hat
+        self.t_prev = t
+        return self._wrap(x_hat.copy())
+
+    def predict(self, t, max_horizon=0.1):
+        """Extrapolate the filtered value to time t (at most max_horizon seconds ahead)"""
+        if self.x_prev is None:
+            return None
+        horizon = min(max(t - self.t_prev, 0.0), max_horizon)
+        return self._wrap(self.x_prev + self.dx_prev * horizon)
+
+    def _wrap(self, x):
+        if self.period is None:
+            return x
+        half = self.period / 2.0
+        return (x + half) % self.period - half
@@ -0,0 +1,249 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import observe
+from recording import iter_frames
+
+
+class CameraSource:
+    """Camera capture on a dedicated thread that always keeps only the newest frame.
+
+    Frames are read into preallocated buffers (triple buffering): the capture thread
+    writes into one, the newest complete frame waits in another, and the consumer
+    owns the third until its next read(). Frames that are overwritten before being
+    read are counted as dropped.
+    """
+
+    def __init__(self, camera_id=0, width=None, height=None, fps=None, fourcc=None):
+        self.camera_id = camera_id
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+
+        self.cap = None
+        self.running = False
+        self.thread = None
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._write_buf = None
+        self._latest_buf = None
+        self._read_buf = None
+        self._latest_time = 0.0
+        self._fresh = False
+
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.frame_time = 0.0  # capture time of the last frame read (seconds)
+        self.finished = False  # a camera never runs out of frames
+
+    def open(self):
+        """Open the camera, apply capture settings and start the capture thread."""
+        self.cap = cv2.VideoCapture(self.camera_id)
+        if not self.cap.isOpened():
+            self.cap.release()
+            return False
+
+        # FOURCC first: some drivers only accept high resolutions/FPS with MJPG
+        if self.fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        if self.width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep the driver-side queue as short as possible
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        ret, frame = self.cap.read()
+        if not ret:
+            self.cap.release()
+            return False
+
+        # Preallocate the three buffers from the first frame
+        self._write_buf = frame
+        self._latest_buf = frame.copy()
+        self._read_buf = frame.copy()
+        self._latest_time = time.perf_counter()
+        self._fresh = True
+
+        h, w = frame.shape[:2]
+        print(f"[OK] Camera {self.camera_id}: {w}x{h} @ {self.cap.get(cv2.CAP_PROP_FPS):.0f}fps")
+
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def close(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+    def read(self, timeout=1.0):
+        """Wait for a frame newer than the last one read.
+
+        Returns (frame, capture_time) or (None, None) on timeout. The frame buffer
+        stays valid until the next read() call.
+        """
+        with self._new_frame:
+            if not self._fresh and not self._new_frame.wait_for(lambda: self._fresh or not self.running, timeout):
+                return None, None
+            if not self._fresh:
+                return None, None
+            self._read_buf, self._latest_buf = self._latest_buf, self._read_buf
+            self._fresh = False
+            self.frame_time = self._latest_time
+            return self._read_buf, self._latest_time
+
+    def stats(self):
+        return {"captured": self.captured_frames, "dropped": self.dropped_frames}
+
+    def _capture_loop(self):
+        while self.running:
+            read_start = time.perf_counter()
+            ret, frame = self.cap.read(self._write_buf)
+            if not ret:
+                print("[WARN] Camera frame empty. Retrying...")
+                time.sleep(0.5)
+                continue
+            capture_time = time.perf_counter()
+            observe("tracker_capture", capture_time - read_start)
+
+            with self._new_frame:
+                if frame is not self._write_buf:
+                    # Resolution changed: the driver allocated a new buffer
+                    self._write_buf = frame
+                if self._fresh:
+                    self.dropped_frames += 1
+                self._write_buf, self._latest_buf = self._latest_buf, self._write_buf
+                self._latest_time = capture_time
+                self._fresh = True
+                self.captured_frames += 1
+                self._new_frame.notify_all()
+
+
+class ReplaySource:
+    """Frame source that plays back a tracking recording (see recording.py).
+
+    Same interface as CameraSource. By default every frame is decoded on demand
+    in read(), as fast as the consumer can go and without drops, so a replay is
+    deterministic. With realtime=True a thread paces frames by their recorded
+    timestamps and, like a camera, only the newest frame is kept.
+    frame_time is the recorded timestamp of the last frame read.
+    """
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+
+        self.running = False
+        self.thread = None
+        self.finished = False
+        self._frames = None
+        self._first = None
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._latest = None  # (frame, capture_time, frame_time)
+
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.frame_time = 0.0
+
+    def open(self):
+        try:
+            self._frames = iter_frames(self.path)
+            first = next(self._frames)
+        except (OSError, ValueError, StopIteration) as e:
+            print(f"[ERROR] Cannot replay {self.path}: {e}")
+            return False
+        self._first = first
+        print(f"[OK] Replaying {self.path} ({'real time' if self.realtime else 'as fast as possible'})")
+
+        self.running = True
+        if self.realtime:
+            self.thread = threading.Thread(target=self._playback_loop, daemon=True)
+            self.thread.start()
+        return True
+
+    def close(self):
+        with self._new_frame:
+            self.running = False
+            self._new_frame.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        if self._frames is not None:
+            self._frames.close()
+            self._frames = None
+
+    def read(self, timeout=1.0):
+        """Next frame as (frame, capture_time), or (None, None) on timeout / end of recording"""
+        if not self.realtime:
+            item = self._next_frame()
+            if item is None:
+                return None, None
+            frame, frame_time = item
+            self.captured_frames += 1
+            self.frame_time = frame_time
+            return frame, time.perf_counter()
+
+        with self._new_frame:
+            if not self._new_frame.wait_for(lambda: self._latest is not None or self.finished or not self.running, timeout):
+                return None, None
+            if self._latest is None:
+                return None, None
+            frame, capture_time, self.frame_time = self._latest
+            self._latest = None
+            return frame, capture_time
+
+    def stats(self):
+        return {"captured": self.captured_frames, "dropped": self.dropped_frames}
+
+    def _next_frame(self):
+        """Decode the next recorded frame: (frame, recorded seconds) or None at the end"""
+        if self._first is not None:
+            item, self._first = self._first, None
+        else:
+            item = next(self._frames, None)
+        if item is None:
+            self.finished = True
+            return None
+
+        _, frame_time, jpeg = item
+        read_start = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        observe("tracker_capture", time.perf_counter() - read_start)
+        return frame, frame_time
+
+    def _playback_loop(self):
+        start = time.perf_counter()
+        while self.running:
+            item = self._next_frame()
+            if item is None:
+                break
+            frame, frame_time = item
+            delay = start + frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self._new_frame:
+                if self._latest is not None:
+                    self.dropped_frames += 1
+                self._latest = (frame, time.perf_counter(), frame_time)
+                self.captured_frames += 1
+                self._new_frame.notify_all()
+
+        with self._new_frame:
+            self.finished = True
+            self._new_frame.notify_all()
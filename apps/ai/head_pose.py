@@ -0,0 +1,133 @@
+import json
+
+import cv2
+import numpy as np
+
+
+def rotation_to_euler(rot_vec):
+    """Rodrigues rotation vector -> (pitch, yaw, roll) in degrees"""
+    rmat, _ = cv2.Rodrigues(rot_vec)
+    # Manual Rotation Matrix to Euler Angles conversion
+    sy = np.sqrt(rmat[0,0] * rmat[0,0] + rmat[1,0] * rmat[1,0])
+    singular = sy < 1e-6
+    if not singular:
+        x = np.arctan2(rmat[2,1], rmat[2,2])
+        y = np.arctan2(-rmat[2,0], sy)
+        z = np.arctan2(rmat[1,0], rmat[0,0])
+    else:
+        x = np.arctan2(-rmat[1,2], rmat[1,1])
+        y = np.arctan2(-rmat[2,0], sy)
+        z = 0
+
+    # Convert to degrees for easier debugging and likely receiver expectation
+    return np.degrees([x, y, z])
+
+
+def load_calibration(path):
+    """Load a calibration profile saved as JSON.
+
+    {"image_size": [w, h], "camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]], "dist_coeffs": [k1, k2, p1, p2, k3]}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    return (
+        tuple(profile["image_size"]),
+        np.array(profile["camera_matrix"], dtype=np.float64).reshape(3, 3),
+        np.array(profile.get("dist_coeffs", [0, 0, 0, 0]), dtype=np.float64).reshape(-1, 1),
+    )
+
+
+class HeadPoseEstimator:
+    """Head pose from 2D landmarks via PnP, warm-started from the previous frame.
+
+    Intrinsics are built once per resolution (from a calibration profile when
+    given, otherwise focal length = image width and the principal point at the
+    image center). Each frame refines the previous rvec/tvec with an iterative
+    solve; if that diverges (bad reprojection, head behind the camera or an
+    implausible jump) it falls back to a cold EPnP solve.
+    """
+
+    def __init__(self, model_points, calibration_path=None, max_reprojection_error=0.02, max_rotation_jump=0.6):
+        self.model_points = np.ascontiguousarray(model_points, dtype=np.float64)
+        self.max_reprojection_error = max_reprojection_error  # fraction of image width
+        self.max_rotation_jump = max_rotation_jump            # radians between frames
+
+        self.calibration = load_calibration(calibration_path) if calibration_path else None
+        self._intrinsics = {}  # (w, h) -> (camera_matrix, dist_coeffs)
+
+        self.rvec = None
+        self.tvec = None
+        self.warm_solves = 0
+        self.cold_solves = 0
+
+    def reset(self):
+        """Forget the previous pose (next solve is cold)"""
+        self.rvec = None
+        self.tvec = None
+
+    def intrinsics(self, img_w, img_h):
+        """Camera matrix and distortion for a resolution (cached)"""
+        key = (img_w, img_h)
+        cached = self._intrinsics.get(key)
+        if cached is not None:
+            return cached
+
+        if self.calibration is not None:
+            (calib_w, calib_h), camera_matrix, dist_coeffs = self.calibration
+            # Scale the calibrated intrinsics to the current resolution
+            scale = np.array([[img_w / calib_w], [img_h / calib_h], [1.0]])
+            camera_matrix = camera_matrix * scale
+        else:
+            focal_length = img_w
+            camera_matrix = np.array([
+                [focal_length, 0, img_w / 2],
+                [0, focal_length, img_h / 2],
+                [0, 0, 1]
+            ], dtype=np.float64)
+            dist_coeffs = np.zeros((4, 1), dtype=np.float64)
+
+        self._intrinsics[key] = (camera_matrix, dist_coeffs)
+        return camera_matrix, dist_coeffs
+
+    def solve(self, image_points, img_w, img_h):
+        """Solve the head pose. Returns (rvec, tvec) or None."""
+        image_points = np.ascontiguousarray(image_points, dtype=np.float64)
+        camera_matrix, dist_coeffs = self.intrinsics(img_w, img_h)
+
+        if self.rvec is not None:
+            success, rvec, tvec = cv2.solvePnP(
+                self.model_points, image_points, camera_matrix, dist_coeffs,
+                self.rvec.copy(), self.tvec.copy(), useExtrinsicGuess=True, flags=cv2.SOLVEPNP_ITERATIVE
+            )
+            if success and self._plausible(rvec, tvec, image_points, camera_matrix, dist_coeffs, img_w):
+                self.warm_solves += 1
+                self.rvec, self.tvec = rvec, tvec
+                return rvec, tvec
+
+        # Cold solve: EPnP for an initial estimate, refined iteratively
+        success, rvec, tvec = cv2.solvePnP(
+            self.model_points, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_EPNP
+        )
+        if not success:
+            self.reset()
+            return None
+        success, rvec, tvec = cv2.solvePnP(
+            self.model_points, image_points, camera_matrix, dist_coeffs,
+            rvec, tvec, useExtrinsicGuess=True, flags=cv2.SOLVEPNP_ITERATIVE
+        )
+        if not success:
+            self.reset()
+            return None
+
+        self.cold_solves += 1
+        self.rvec, self.tvec = rvec, tvec
+        return rvec, tvec
+
+    def _plausible(self, rvec, tvec, image_points, camera_matrix, dist_coeffs, img_w):
+        if not (np.all(np.isfinite(rvec)) and np.all(np.isfinite(tvec))) or tvec[2, 0] <= 0:
+            return False
+        if np.linalg.norm(rvec - self.rvec) > self.max_rotation_jump:
+            return False
+        projected, _ = cv2.projectPoints(self.model_points, rvec, tvec, camera_matrix, dist_coeffs)
+        error = np.sqrt(np.mean(np.sum((projected.reshape(-1, 2) - image_points) ** 2, axis=1)))
+        return error <= self.max_reprojection_error * img_w
@@ -4,47 +4,39 @@ VRabater AI Service
 """
 
 import os
+import re
+import importlib.util
 import json
 import time
+import uuid
+import base64
 import threading
-import queue
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from flask_sock import Sock
 
 # Virtual Camera
 from virtual_cam import VirtualCamera
 
-
-# Body Tracking
-from body_tracker import BodyTracker
-
 # 音声処理
-import sounddevice as sd
-import numpy as np
-import scipy.io.wavfile as wavfile
-
-# STT
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
+from audio_io import decode_audio, is_compressed_mimetype
+from streaming_stt import UtteranceSegmenter
+from stt_worker import STTWorker, STTBusyError
+from tts_cache import TTSCache, entry_base64
+from tts_engines import create_engine
+from chat_sessions import ChatSessionStore
+from metrics import REGISTRY as metrics_registry, observe, timed
+from serving import CallPool, CallTimeoutError, ClosingStream, HealthProber, PoolBusyError, run_server
+from startup import StartupOrchestrator
+
+# STT（whisper・mediapipeなど重いモジュールは各サブシステムの初期化時にimportする）
+WHISPER_AVAILABLE = importlib.util.find_spec("whisper") is not None
+if not WHISPER_AVAILABLE:
     print("[WARN] Whisper is not installed (pip install openai-whisper)")
 
 # Ollama API
 import requests
 
-# TTS
-try:
-    from gtts import gTTS
-    import io
-    import base64
-    TTS_AVAILABLE = True
-except ImportError:
-    TTS_AVAILABLE = False
-    print("[WARN] gTTS is not installed (pip install gtts)")
-
 app = Flask(__name__)
 CORS(app)
 sock = Sock(app)
@@ -57,12 +49,37 @@ CONFIG = {
         "language": "ja",
         "sample_rate": 16000,
         "buffer_duration": 3.0,
+        # ストリーミング認識 (/stt/stream) のVAD設定
+        "stream": {
+            "frame_ms": 30,            # VADのフレーム長
+            "threshold_ratio": 3.0,    # ノイズフロアに対する発話判定の倍率
+            "min_rms": 0.01,           # 発話判定の最小RMS
+            "pre_roll_ms": 200,        # 発話開始前に含める音声
+            "min_speech_ms": 200,      # これ以上続いたら発話開始
+            "end_silence_ms": 500,     # これ以上無音が続いたら発話終了
+            "partial_interval": 1.0,   # 途中結果を出す間隔（秒、0で無効）
+            "max_utterance": 15.0,     # 1発話の最大長（秒）
+        },
+        # 推論ワーカー（モデルを専有し、キューからまとめて推論）
+        "worker": {
+            "max_queue": 8,            # 待ち行列の上限（超えたら503）
+            "max_batch": 4,            # 1回のデコードでまとめる件数
+            "batch_window": 0.02,      # バッチをまとめる待ち時間（秒）
+            "max_wait": 15.0,          # これ以上待たされたリクエストは捨てる（秒）
+        },
     },
     "llm": {
         "url": "http://localhost:11434",  # Ollama default
         "model": "qwen2.5:3b-instruct-q4_K_M",
         "max_tokens": 100,
         "temperature": 0.8,
+        "keep_alive": "30m",  # モデルをメモリに常駐させる時間
+        # 会話セッション（session_id付きリクエストの履歴保持）
+        "sessions": {
+            "max_sessions": 32,
+            "max_turns": 10,   # 保持する往復数
+            "ttl": 1800.0,     # 最終利用からの保持時間（秒）
+        },
         "system_prompt": """あなたは白山の里山に住む、優しくて親しみやすい相棒です。
 言葉には「水」「流れ」「澄む」「峠」などの自然の比喩を控えめに使い、
 短く、テンポよく応答します。冗長にならず、相手の意図をくみ取って一言で提案します。
@@ -73,34 +90,166 @@ CONFIG = {
 """
     },
     "tts": {
+        "engine": "gtts",  # gtts（要ネットワーク, MP3） / piper（オフライン, WAV/PCM）
+        "fallback_engine": "gtts",  # engineの初期化に失敗したときに使う
         "model": "ja-JP-wavenet-B",
         "speed": 1.1,
         "pitch": 1.2,
+        "lang": "ja",
+        "piper": {
+            "model": os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "piper", "voice.onnx"),
+            "config": None,       # 省略時は model + ".json"
+            "output": "wav",      # wav / pcm (int16 mono)
+            "speaker_id": None,
+        },
+        # 合成済み音声のキャッシュ（メモリLRU + ディスク）
+        "cache": {
+            "enabled": True,
+            "memory_mb": 32,
+            "disk_mb": 256,       # 超えたら使われていない順に削除
+            "dir": os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "tts"),
+            # 起動時に事前合成するフレーズ（相づち・定型応答など）
+            "prewarm": [
+                "こんにちは！",
+                "お疲れさま。",
+                "うんうん。",
+                "なるほど。",
+                "ちょっと待ってね。",
+            ],
+        },
+    },
+    # 起動時に初期化するサブシステム（外したものは最初に使われたときに初期化する）
+    "startup": {
+        "preload": ["stt", "tts", "tts_cache", "llm", "tracking"],
+    },
+    # サーバー（時間のかかる呼び出しは専用プールで実行し、タイムアウトで打ち切る）
+    "serving": {
+        "mode": "auto",            # auto（POSIXでgunicornがあれば使う） / gunicorn / werkzeug
+        "threads": 32,             # gunicornのスレッド数（WebSocket接続ごとに1本使う）
+        "health_interval": 5.0,    # Ollamaの状態確認の間隔（秒）
+        "timeouts": {              # 504を返すまでの時間（秒）
+            "llm": 35.0,
+            "tts": 15.0,
+            "stt": 20.0,
+        },
+        "pools": {                 # 同時実行数（待機はその2倍まで、超えたら503）
+            "llm": 2,
+            "tts": 4,
+        },
+    },
+    "tracking": {
+        "running_mode": "live_stream",  # image / video / live_stream
+        "camera_ids": [0, 1, 2],
+        # カメラ設定（Noneはドライバの既定値）
+        "capture": {
+            "width": None,
+            "height": None,
+            "fps": None,
+            "fourcc": None,  # "MJPG" にすると高解像度でもFPSが出やすい
+        },
+        # 推論入力（前フレームの人物周辺を切り出し、指定幅まで縮小）
+        "inference": {
+            "max_width": 640,
+            "roi": True,
+        },
+        # 推論結果の平滑化（One-Euroフィルタ）
+        "filter": {
+            "enabled": True,
+        },
+        # 頭部姿勢推定のカメラキャリブレーション（JSON、Noneなら推定値）
+        "head_pose": {
+            "calibration": None,
+        },
+        # カメラプレビュー（/preview。視聴中のみ別スレッドでJPEGエンコード）
+        "preview": {
+            "enabled": False,
+            "fps": 10,
+            "draw_landmarks": True,
+        },
+        # OSC出力レート（推論FPSとは独立。予測で補間する。0で推論ごとに送信）
+        "output": {
+            "rate": 60,
+        },
     }
 }
 
+# Ollama未起動時のエラーメッセージ
+OLLAMA_CONNECTION_ERROR = "Ollamaに接続できません。起動していますか？"
+
+# ストリーミング時の文の区切り（句点・感嘆符・疑問符・改行、英文の ". "）
+# 閉じ括弧・引用符は直前の文に含める
+SENTENCE_PATTERN = re.compile(r'.*?(?:[。！？!?…\n]+|\.(?=\s))[」』）)"\']*', re.S)
+
+# 音声形式ごとのContent-Type（pcmはaudio_mimetypeで組み立てる）
+AUDIO_MIMETYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+}
+
+# Ollamaへの接続はセッションで使い回す（TCP接続の再利用）
+http_session = requests.Session()
+http_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# 会話セッション
+chat_sessions = ChatSessionStore(
+    max_sessions=CONFIG["llm"]["sessions"]["max_sessions"],
+    max_turns=CONFIG["llm"]["sessions"]["max_turns"],
+    ttl=CONFIG["llm"]["sessions"]["ttl"],
+)
+
+# LLM・TTSの呼び出しプールと、依存サービスの状態確認
+llm_pool = CallPool("llm", CONFIG["serving"]["pools"]["llm"], CONFIG["serving"]["pools"]["llm"] * 2)
+tts_pool = CallPool("tts", CONFIG["serving"]["pools"]["tts"], CONFIG["serving"]["pools"]["tts"] * 2)
+
 # グローバル変数
 whisper_model = None
-audio_queue = queue.Queue()
-is_recording = False
-is_recording = False
+stt_worker = None    # Whisperを専有する推論ワーカー
+tts_engine = None    # TTSエンジン（CONFIG["tts"]["engine"]）
+tts_cache = None     # 合成済み音声のキャッシュ
 body_tracker = None  # MediaPipe Body Tracker
 virtual_cam = None   # Virtual Camera
 
+# /metrics のゲージ（未起動のサブシステムは出力しない）
+metrics_registry.register_gauge(
+    "stt_queue_depth", "Pending STT requests.",
+    lambda: stt_worker.queue_depth if stt_worker else None
+)
+metrics_registry.register_gauge(
+    "camera_dropped_frames", "Camera frames overwritten before the tracker read them.",
+    lambda: body_tracker.source.dropped_frames if body_tracker and body_tracker.source else None
+)
+metrics_registry.register_gauge(
+    "tts_cache_misses", "TTS requests that needed synthesis.",
+    lambda: tts_cache.misses if tts_cache else None
+)
+
 
 
 def init_whisper():
     """Whisperモデルの初期化"""
-    global whisper_model
+    global whisper_model, stt_worker
     
     if not WHISPER_AVAILABLE:
         print("⚠️ Whisper未インストール、STT無効")
         return False
     
     try:
+        import whisper
+        
         model_name = CONFIG["stt"]["model"]
         print(f"[LOAD] Whisper {model_name} model loading...")
         whisper_model = whisper.load_model(model_name)
+        
+        worker_config = CONFIG["stt"]["worker"]
+        stt_worker = STTWorker(
+            whisper_model,
+            language=CONFIG["stt"]["language"],
+            max_queue=worker_config["max_queue"],
+            max_batch=worker_config["max_batch"],
+            batch_window=worker_config["batch_window"],
+            max_wait=worker_config["max_wait"],
+        )
+        stt_worker.start()
         print(f"[OK] Whisper initialized")
         return True
     except Exception as e:
@@ -108,87 +257,240 @@ def init_whisper():
         return False
 
 
-def stt_transcribe(audio_data):
-    """音声からテキストへ変換"""
-    if not whisper_model:
+def stt_transcribe(audio_data, timeout=None):
+    """音声からテキストへ変換
+    audio_data: float32のモノラル音声（16kHz, decode_audioの出力）
+    
+    推論は専用ワーカーで行う。混雑時はSTTBusyError、timeout秒を超えたらCallTimeoutErrorを送出する
+    """
+    if not stt_worker:
         return {"error": "Whisperモデル未初期化"}
     
+    if audio_data.size == 0:
+        return {"error": "音声データが空です"}
+    
     try:
-        # 一時ファイルに保存
-        temp_file = "temp_audio.wav"
-        wavfile.write(temp_file, CONFIG["stt"]["sample_rate"], audio_data)
-        
-        # 文字起こし
-        result = whisper_model.transcribe(
-            temp_file,
-            language=CONFIG["stt"]["language"],
-            fp16=False  # CPUの場合はFalse
-        )
-        
-        # クリーンアップ
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        
-        return {"text": result["text"], "language": result["language"]}
+        # 文字起こし（配列を直接渡すので一時ファイル・ffmpegデコード不要）
+        return stt_worker.transcribe(audio_data, timeout)
     
+    except STTBusyError:
+        raise
+    except TimeoutError:
+        raise CallTimeoutError(f"stt: {timeout}秒以内に終わりませんでした")
     except Exception as e:
         print(f"❌ STTエラー: {e}")
         return {"error": str(e)}
 
 
-def llm_generate(prompt, system_prompt=None):
-    """Ollama LLMで応答生成"""
-    try:
-        url = f"{CONFIG['llm']['url']}/api/generate"
-        
-        payload = {
-            "model": CONFIG["llm"]["model"],
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": CONFIG["llm"]["temperature"],
-                "num_predict": CONFIG["llm"]["max_tokens"],
-            }
+def build_llm_request(prompt, system_prompt=None, session_id=None, stream=False):
+    """Ollamaへのリクエスト (URL, payload) を組み立てる
+    
+    session_idがあれば /api/chat に履歴付きで送る（前回までのプレフィックスは
+    Ollama側のキャッシュが効くため再評価されない）。なければ /api/generate
+    """
+    payload = {
+        "model": CONFIG["llm"]["model"],
+        "stream": stream,
+        "keep_alive": CONFIG["llm"]["keep_alive"],
+        "options": {
+            "temperature": CONFIG["llm"]["temperature"],
+            "num_predict": CONFIG["llm"]["max_tokens"],
         }
+    }
+    
+    if session_id:
+        payload["messages"] = chat_sessions.build_messages(session_id, prompt, system_prompt)
+        return f"{CONFIG['llm']['url']}/api/chat", payload
+    
+    payload["prompt"] = prompt
+    if system_prompt:
+        payload["system"] = system_prompt
+    return f"{CONFIG['llm']['url']}/api/generate", payload
+
+
+def extract_llm_text(result):
+    """/api/generate と /api/chat のレスポンスから本文を取り出す"""
+    if "message" in result:
+        return result["message"].get("content", "")
+    return result.get("response", "")
+
+
+def llm_generate(prompt, system_prompt=None, session_id=None, cancel_event=None):
+    """Ollama LLMで応答生成
+    
+    cancel_eventを渡すとストリーミングで受け取り、Eventが立った時点で接続を切る
+    （Ollama側の生成も止まる）
+    """
+    try:
+        if cancel_event is not None:
+            text = "".join(llm_generate_stream(prompt, system_prompt, cancel_event, session_id))
+            if cancel_event.is_set():
+                return {"error": "LLMの生成を中断しました"}
+            return {"text": text, "model": CONFIG["llm"]["model"]}
         
-        if system_prompt:
-            payload["system"] = system_prompt
+        url, payload = build_llm_request(prompt, system_prompt, session_id)
         
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
+        with timed("llm"):
+            response = http_session.post(url, json=payload, timeout=30)
+            response.raise_for_status()
+            result = response.json()
         
-        result = response.json()
-        return {"text": result.get("response", ""), "model": result.get("model")}
+        text = extract_llm_text(result)
+        if session_id:
+            chat_sessions.append_turn(session_id, prompt, text)
+        return {"text": text, "model": result.get("model")}
     
     except requests.exceptions.ConnectionError:
-        return {"error": "Ollamaに接続できません。起動していますか？"}
+        health_prober.report("llm", False, OLLAMA_CONNECTION_ERROR)
+        return {"error": OLLAMA_CONNECTION_ERROR}
     except Exception as e:
         print(f"[ERROR] LLM Error: {e}")
         return {"error": str(e)}
 
 
-def tts_synthesize(text):
-    """テキストから音声合成（gTTS）"""
-    if not TTS_AVAILABLE:
-        print(f"⚠️ TTS: gTTSが利用できません")
+def llm_generate_stream(prompt, system_prompt=None, cancel_event=None, session_id=None):
+    """Ollama LLMでトークン単位のストリーミング生成（ジェネレータ）"""
+    url, payload = build_llm_request(prompt, system_prompt, session_id, stream=True)
+    
+    tokens = []
+    completed = False
+    start_time = time.perf_counter()
+    
+    # Ollamaは1行1JSONでトークンを返す
+    with http_session.post(url, json=payload, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if not line:
+                continue
+            chunk = json.loads(line)
+            token = extract_llm_text(chunk)
+            if token:
+                if not tokens:
+                    observe("llm_first_token", time.perf_counter() - start_time)
+                tokens.append(token)
+                yield token
+            if chunk.get("done"):
+                completed = True
+                observe("llm", time.perf_counter() - start_time)
+                break
+    
+    # 最後まで生成できたときだけ履歴に残す
+    if session_id and completed:
+        chat_sessions.append_turn(session_id, prompt, "".join(tokens))
+
+
+def split_sentences(tokens):
+    """トークン列を文単位に区切るジェネレータ（句点・感嘆符・疑問符・改行で区切る）"""
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        while True:
+            match = SENTENCE_PATTERN.match(buffer)
+            if not match:
+                break
+            sentence = match.group(0).strip()
+            buffer = buffer[match.end():]
+            if sentence:
+                yield sentence
+    
+    # 最後に残った文（句点なし）
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def init_tts():
+    """TTSエンジンの初期化（失敗時はfallback_engineを試す）"""
+    global tts_engine
+    
+    tts_config = CONFIG["tts"]
+    candidates = [tts_config["engine"]]
+    if tts_config.get("fallback_engine") and tts_config["fallback_engine"] not in candidates:
+        candidates.append(tts_config["fallback_engine"])
+    
+    for name in candidates:
+        try:
+            tts_engine = create_engine(name, tts_config)
+            print(f"[OK] TTS engine: {name} ({tts_engine.audio_format})")
+            return True
+        except ImportError as e:
+            print(f"[WARN] TTS engine '{name}' is not installed: {e}")
+        except Exception as e:
+            print(f"[ERROR] TTS engine '{name}' initialization error: {e}")
+    
+    return False
+
+
+def init_tts_cache():
+    """TTSキャッシュの初期化と事前合成（バックグラウンド）"""
+    global tts_cache
+    
+    cache_config = CONFIG["tts"]["cache"]
+    if not cache_config["enabled"]:
+        return
+    
+    tts_cache = TTSCache(
+        max_memory_bytes=cache_config["memory_mb"] * 1024 * 1024,
+        cache_dir=cache_config["dir"],
+        max_disk_bytes=cache_config["disk_mb"] * 1024 * 1024,
+    )
+    print(f"[OK] TTS cache ready ({tts_cache.stats()['disk_entries']} entries on disk)")
+    
+    phrases = cache_config["prewarm"]
+    if phrases and tts_engine:
+        def prewarm():
+            items = [(tts_cache_key(text), text) for text in phrases]
+            warmed = tts_cache.prewarm(items, tts_engine.synthesize)
+            print(f"[OK] TTS cache prewarmed ({warmed} new phrases)")
+        
+        threading.Thread(target=prewarm, daemon=True).start()
+
+
+def tts_cache_key(text):
+    """合成条件（エンジン・テキスト・言語・話速・ピッチ）からキャッシュキーを作る"""
+    tts_config = CONFIG["tts"]
+    engine = f"{tts_engine.name}:{tts_engine.audio_format}"
+    return TTSCache.make_key(text, tts_config["lang"], tts_config["speed"], tts_config["pitch"], engine)
+
+
+def audio_mimetype(audio_format, sample_rate=None):
+    """音声形式からContent-Typeを決める"""
+    if audio_format == "pcm":
+        return f"audio/L16; rate={sample_rate}; channels=1"
+    return AUDIO_MIMETYPES.get(audio_format, "application/octet-stream")
+
+
+def tts_synthesize_audio(text):
+    """テキストから音声合成（CONFIG["tts"]["engine"]、キャッシュがあればそちらを使う）
+    
+    戻り値の"audio"は音声バイナリ（bytes）。JSON用のBase64はtts_synthesizeで付ける
+    """
+    if not tts_engine:
+        if startup.ensure("tts"):
+            return tts_synthesize_audio(text)
+        print(f"⚠️ TTS: エンジンが利用できません ({startup.state('tts')})")
         return {"audio": None, "message": "TTS未インストール"}
     
+    def synthesize():
+        with timed("tts"):
+            return tts_engine.synthesize(text)
+    
     try:
-        # gTTSで音声合成
-        tts = gTTS(text=text, lang='ja', slow=False)
-        
-        # メモリ上のバッファに保存
-        audio_buffer = io.BytesIO()
-        tts.write_to_fp(audio_buffer)
-        audio_buffer.seek(0)
-        
-        # Base64エンコード
-        audio_base64 = base64.b64encode(audio_buffer.read()).decode('utf-8')
+        if tts_cache:
+            entry, cached = tts_cache.get_or_synthesize(tts_cache_key(text), synthesize)
+        else:
+            audio, audio_format = synthesize()
+            entry, cached = {"audio": audio, "format": audio_format}, False
         
-        print(f"[TTS] Synthesizing: {text[:30]}...")
+        if not cached:
+            print(f"[TTS] Synthesizing: {text[:30]}...")
         return {
-            "audio": audio_base64,
-            "format": "mp3",
+            "audio": entry["audio"],
+            "format": entry["format"],
+            "sample_rate": tts_engine.sample_rate,
+            "cached": cached,
+            "entry": entry,
             "message": "音声合成完了"
         }
     except Exception as e:
@@ -196,46 +498,314 @@ def tts_synthesize(text):
         return {"audio": None, "message": f"TTS failure: {str(e)}"}
 
 
+def tts_synthesize(text):
+    """テキストから音声合成し、音声をBase64文字列で返す（JSON応答用）"""
+    result = tts_synthesize_audio(text)
+    return tts_result_base64(result)
+
+
+def tts_result_base64(result):
+    """tts_synthesize_audioの結果の音声をBase64文字列にする"""
+    entry = result.pop("entry", None)
+    if entry is not None:
+        result["audio"] = entry_base64(entry)
+    return result
+
+
+def wants_binary(*binary_types):
+    """Acceptヘッダでバイナリ形式がJSONより優先されているか"""
+    best = request.accept_mimetypes.best_match(("application/json",) + binary_types, default="application/json")
+    return best != "application/json"
+
+
+def audio_headers(tts_result):
+    """バイナリ音声応答のメタデータヘッダ"""
+    headers = {
+        "X-Audio-Format": tts_result["format"],
+        "X-TTS-Cache": "hit" if tts_result.get("cached") else "miss",
+    }
+    if tts_result.get("sample_rate"):
+        headers["X-Sample-Rate"] = str(tts_result["sample_rate"])
+    return headers
+
+
+def multipart_part(content_type, body, headers=None):
+    """multipart/mixedの1パート分（境界行を除く）をbytesで組み立てる"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    lines = [f"Content-Type: {content_type}", f"Content-Length: {len(body)}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8") + body + b"\r\n"
+
+
+def multipart_response(parts, subtype="mixed"):
+    """(Content-Type, body, headers) の列をチャンク転送のmultipart/mixedで返す（MJPEGはx-mixed-replace）"""
+    boundary = uuid.uuid4().hex
+    
+    def generate():
+        for content_type, body, headers in parts:
+            yield f"--{boundary}\r\n".encode("utf-8") + multipart_part(content_type, body, headers)
+        yield f"--{boundary}--\r\n".encode("utf-8")
+    
+    return Response(stream_with_context(generate()), mimetype=f"multipart/{subtype}; boundary={boundary}")
+
+
+def event_to_json(event):
+    """チャットイベントをJSON文字列にする（音声バイナリはBase64へ）"""
+    if isinstance(event.get("audio"), bytes):
+        event = dict(event, audio=base64.b64encode(event["audio"]).decode("utf-8"))
+    return json.dumps(event, ensure_ascii=False)
+
+
+def chat_stream_events(user_input, session_id=None):
+    """ストリーミングチャット（LLMトークン → 文単位TTS）のイベントを順に返すイテレータを返す
+    
+    LLMの生成はllm_poolのスレッドで進め、確定した文から順にtts_poolで音声合成して返すため、
+    次の文の生成中に前の文の音声を再生できる。
+    LLMの枠が空いていなければこの呼び出しの時点でPoolBusyErrorを送出する。
+    使い終わったら（反復しなかった場合も）必ずclose()してLLMの生成を打ち切ること。
+    sentenceイベントの"audio"は音声バイナリ（bytes）
+    """
+    sentence_stream = llm_pool.stream(
+        lambda cancel_event: split_sentences(
+            llm_generate_stream(user_input, CONFIG['llm']['system_prompt'], cancel_event, session_id)
+        ),
+        timeout=CONFIG["serving"]["timeouts"]["llm"],
+    )
+    return ClosingStream(_chat_stream_events(user_input, sentence_stream), sentence_stream.close)
+
+
+def _chat_stream_events(user_input, sentence_stream):
+    sentences = []
+    try:
+        yield {"type": "start", "input": user_input}
+        
+        try:
+            for sentence in sentence_stream:
+                # 文ごとにTTS（この間もLLMは次の文を生成している）
+                tts_result = pooled_tts_or_error(sentence)
+                yield {
+                    "type": "sentence",
+                    "index": len(sentences),
+                    "text": sentence,
+                    "audio": tts_result.get('audio'),
+                    "audio_format": tts_result.get('format', 'mp3'),
+                    "sample_rate": tts_result.get('sample_rate')
+                }
+                sentences.append(sentence)
+        except requests.exceptions.ConnectionError:
+            health_prober.report("llm", False, OLLAMA_CONNECTION_ERROR)
+            yield {"type": "error", "error": OLLAMA_CONNECTION_ERROR}
+        except CallTimeoutError as e:
+            yield {"type": "error", "error": str(e)}
+        except Exception as e:
+            print(f"[ERROR] LLM Stream Error: {e}")
+            yield {"type": "error", "error": str(e)}
+        
+        yield {"type": "done", "input": user_input, "response": "".join(sentences)}
+    finally:
+        # クライアント切断時はLLMの生成も打ち切る
+        sentence_stream.close()
+
+
+def pooled_llm_generate(prompt, system_prompt=None, session_id=None):
+    """llm_poolでllm_generateを実行する（タイムアウトしたら生成を中断してCallTimeoutError）"""
+    return llm_pool.call(
+        lambda cancel_event: llm_generate(prompt, system_prompt, session_id, cancel_event),
+        timeout=CONFIG["serving"]["timeouts"]["llm"],
+    )
+
+
+def pooled_tts_synthesize_audio(text):
+    """tts_poolでtts_synthesize_audioを実行する（タイムアウトしても合成は裏で続き、キャッシュに残る）"""
+    return tts_pool.call(lambda cancel_event: tts_synthesize_audio(text), timeout=CONFIG["serving"]["timeouts"]["tts"])
+
+
+def pooled_tts_or_error(text):
+    """pooled_tts_synthesize_audioと同じ。混雑・タイムアウトは音声なしの結果にする（応答の途中で使う）"""
+    try:
+        return pooled_tts_synthesize_audio(text)
+    except (CallTimeoutError, PoolBusyError) as e:
+        return {"audio": None, "message": str(e)}
+
+
+def subsystem_unavailable(name, message):
+    """サブシステムが使えないときの503応答（未初期化なら初期化を始め、初期化中はRetry-Afterを付ける）"""
+    startup.ensure(name)
+    state = startup.state(name)
+    response = jsonify({"error": message, "state": state})
+    if state == "starting":
+        response.headers["Retry-After"] = "2"
+    return response, 503
+
+
 # ===== API エンドポイント =====
 
+@app.errorhandler(CallTimeoutError)
+def call_timeout_handler(e):
+    """LLM・TTS・STTが制限時間内に終わらなかった"""
+    return jsonify({"error": str(e)}), 504
+
+
+@app.errorhandler(PoolBusyError)
+def pool_busy_handler(e):
+    """処理待ちが上限に達している（クライアントはRetry-After後に再送）"""
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """ヘルスチェック"""
+    """ヘルスチェック（Ollamaの状態はhealth_proberが確認した結果を返すだけで、ここでは問い合わせない）"""
     return jsonify({
         "status": "ok",
         "services": {
             "stt": whisper_model is not None,
-            "llm": check_ollama_status(),
-            "tts": TTS_AVAILABLE
-        }
+            "llm": health_prober.ok("llm"),
+            "tts": tts_engine is not None
+        },
+        "startup": startup.status(),
+        "probes": health_prober.snapshot(),
+        "pools": {"llm": llm_pool.stats(), "tts": tts_pool.stats()},
+        "stt_queue": stt_worker.stats() if stt_worker else None,
+        "tts_cache": tts_cache.stats() if tts_cache else None,
+        "virtual_cam": virtual_cam.stats() if virtual_cam else None
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """処理段ごとの所要時間（Prometheusテキスト形式）"""
+    return Response(metrics_registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/stt', methods=['POST'])
 def stt_endpoint():
-    """音声認識エンドポイント"""
-    if not whisper_model:
-        return jsonify({"error": "STT未初期化"}), 503
+    """音声認識エンドポイント
+    
+    音声はmultipartの"audio"フィールド、またはリクエストボディ(バイナリ)で受け取る。
+    WAVはヘッダから判別する。圧縮音声（WebM, Ogg, MP3, FLAC）はContent-Typeで明示されたものだけ
+    ffmpegでデコードし、それ以外（application/octet-stream等）はヘッダなしのint16 PCMとして
+    "sample_rate"パラメータ（省略時は16000）で解釈する。
+    """
+    if not stt_worker:
+        return subsystem_unavailable("stt", "STT未初期化")
     
     try:
-        # 音声データ受信（base64 or バイナリ）
-        audio_data = request.files.get('audio')
-        if not audio_data:
+        # 音声データ受信（multipart or バイナリ）
+        audio_file = request.files.get('audio')
+        audio_bytes = audio_file.read() if audio_file else request.get_data()
+        if not audio_bytes:
             return jsonify({"error": "音声データがありません"}), 400
         
-        # NumPy配列に変換
-        audio_bytes = audio_data.read()
-        audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
+        sample_rate = request.values.get('sample_rate', type=int)
+        # 圧縮音声のContent-Typeでなければ（sample_rate指定・octet-stream等）ヘッダなしPCM（先頭バイトで形式を推測しない）
+        mimetype = audio_file.mimetype if audio_file else request.mimetype
+        raw = sample_rate is not None or not is_compressed_mimetype(mimetype)
+        
+        # メモリ上でfloat32配列に変換（WAV/PCMの解析・リサンプリング・正規化）
+        with timed("stt_decode"):
+            audio_array = decode_audio(audio_bytes, sample_rate, raw=raw)
         
         # 文字起こし
-        result = stt_transcribe(audio_array)
+        result = stt_transcribe(audio_array, CONFIG["serving"]["timeouts"]["stt"])
         
         return jsonify(result)
     
+    except CallTimeoutError:
+        raise
+    except STTBusyError as e:
+        # 混雑時は待たせずに断る（クライアントはRetry-After後に再送）
+        response = jsonify({"error": str(e), "queue_depth": e.queue_depth})
+        response.headers["Retry-After"] = "1"
+        return response, 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@sock.route('/stt/stream')
+def stt_stream_socket(ws):
+    """ストリーミング音声認識用WebSocket
+    
+    受信: int16 PCM（モノラル）のバイナリチャンク。サンプリングレートは
+          クエリ "sample_rate"（省略時16000）。{"type": "end"} で残りを確定
+    送信: start（発話開始）/ partial（途中結果）/ final（確定結果）
+    """
+    if not stt_worker:
+        startup.ensure("stt")
+        ws.send(json.dumps({"type": "error", "error": "STT未初期化", "state": startup.state("stt")}, ensure_ascii=False))
+        ws.close()
+        return
+    
+    sample_rate = request.args.get('sample_rate', CONFIG["stt"]["sample_rate"], type=int)
+    stream_config = CONFIG["stt"]["stream"]
+    segmenter = UtteranceSegmenter(
+        sample_rate,
+        frame_ms=stream_config["frame_ms"],
+        threshold_ratio=stream_config["threshold_ratio"],
+        min_rms=stream_config["min_rms"],
+        pre_roll_ms=stream_config["pre_roll_ms"],
+        min_speech_ms=stream_config["min_speech_ms"],
+        end_silence_ms=stream_config["end_silence_ms"],
+        partial_interval=stream_config["partial_interval"],
+        max_utterance=stream_config["max_utterance"],
+    )
+    utterance = 0
+    
+    print(f"🔌 WebSocket: 音声認識ストリーム接続 ({sample_rate}Hz)")
+    
+    def handle_events(events):
+        nonlocal utterance
+        for kind, audio in events:
+            if kind == "start":
+                ws.send(json.dumps({"type": "start", "utterance": utterance}))
+                continue
+            
+            try:
+                result = stt_transcribe(audio, CONFIG["serving"]["timeouts"]["stt"])
+            except (STTBusyError, CallTimeoutError) as e:
+                # 途中結果は混雑時には捨てる。確定結果はエラーとして通知
+                if kind == "partial":
+                    continue
+                result = {"error": str(e)}
+                if isinstance(e, STTBusyError):
+                    result["queue_depth"] = e.queue_depth
+            
+            event = {
+                "type": kind,
+                "utterance": utterance,
+                "duration": round(audio.size / CONFIG["stt"]["sample_rate"], 3),
+            }
+            event.update(result)
+            ws.send(json.dumps(event, ensure_ascii=False))
+            
+            if kind == "final":
+                utterance += 1
+    
+    try:
+        while True:
+            data = ws.receive()
+            if data is None:
+                break
+            
+            if isinstance(data, str):
+                # 制御メッセージ
+                try:
+                    message = json.loads(data)
+                except ValueError:
+                    continue
+                if isinstance(message, dict) and message.get("type") == "end":
+                    handle_events(segmenter.flush())
+                continue
+            
+            handle_events(segmenter.feed(data))
+    
+    except Exception as e:
+        print(f"[WARN] STT WebSocket disconnected: {e}")
+
+
 @app.route('/llm', methods=['POST'])
 def llm_endpoint():
     """LLM推論エンドポイント"""
@@ -247,44 +817,126 @@ def llm_endpoint():
     prompt = data['prompt']
     system_prompt = data.get('system_prompt', CONFIG['llm']['system_prompt'])
     
-    result = llm_generate(prompt, system_prompt)
+    result = pooled_llm_generate(prompt, system_prompt, data.get('session_id'))
     
     return jsonify(result)
 
 
 @app.route('/tts', methods=['POST'])
 def tts_endpoint():
-    """音声合成エンドポイント"""
+    """音声合成エンドポイント
+    
+    Accept: audio/* なら音声バイナリをそのまま返す（メタデータはX-*ヘッダ）。
+    それ以外は従来どおりBase64入りのJSON
+    """
     data = request.json
     
     if not data or 'text' not in data:
         return jsonify({"error": "textが必要です"}), 400
     
-    result = tts_synthesize(data['text'])
+    if data.get('stream') and tts_engine:
+        # 生成された順に音声チャンクを返す（Piperは文ごとの生PCM）。合成はtts_poolで行う
+        text = data['text']
+        chunks = tts_pool.stream(
+            lambda cancel_event: tts_engine.synthesize_stream(text),
+            timeout=CONFIG["serving"]["timeouts"]["tts"],
+        )
+        
+        def generate_audio():
+            try:
+                yield from chunks
+            except CallTimeoutError as e:
+                # 送信を始めた後はステータスを変えられないので、そこで打ち切る
+                print(f"[WARN] TTS stream aborted: {e}")
+        
+        response = Response(
+            stream_with_context(generate_audio()),
+            mimetype=audio_mimetype(tts_engine.stream_format, tts_engine.sample_rate)
+        )
+        # 送信前にクライアントが切断しても合成を打ち切る
+        response.call_on_close(chunks.close)
+        return response
+    
+    result = pooled_tts_synthesize_audio(data['text'])
     
-    return jsonify(result)
+    if wants_binary("audio/mpeg", "audio/wav", "audio/L16", "application/octet-stream"):
+        if result.get('audio') is None:
+            return jsonify({"error": result.get('message')}), 503
+        return Response(
+            result['audio'],
+            mimetype=audio_mimetype(result['format'], result.get('sample_rate')),
+            headers=audio_headers(result)
+        )
+    
+    return jsonify(tts_result_base64(result))
 
 
 @app.route('/chat', methods=['POST'])
 def chat_endpoint():
-    """統合チャット（STT → LLM → TTS）"""
+    """統合チャット（STT → LLM → TTS）
+    
+    "stream": true の場合は文ごとのイベントをNDJSON（チャンク転送）で返す。
+    Accept: multipart/mixed なら音声をBase64にせず、JSONパートと音声パートを
+    交互に並べたmultipartで返す（ストリーミング時は文ごと）
+    """
     data = request.json
     
     if not data or 'text' not in data:
         return jsonify({"error": "textが必要です"}), 400
     
     user_input = data['text']
+    session_id = data.get('session_id')
+    binary = wants_binary("multipart/mixed")
+    
+    if data.get('stream'):
+        events = chat_stream_events(user_input, session_id)
+        
+        if binary:
+            def generate_parts():
+                for event in events:
+                    audio = event.pop("audio", None)
+                    yield "application/json; charset=utf-8", event_to_json(event), None
+                    if audio is not None:
+                        yield audio_mimetype(event["audio_format"], event.get("sample_rate")), audio, {
+                            "X-Sentence-Index": event["index"],
+                        }
+            
+            response = multipart_response(generate_parts())
+        else:
+            def generate_ndjson():
+                for event in events:
+                    yield event_to_json(event) + "\n"
+            
+            response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+        
+        # 送信前にクライアントが切断しても生成を打ち切る
+        response.call_on_close(events.close)
+        return response
     
     # LLM応答生成
-    llm_result = llm_generate(user_input, CONFIG['llm']['system_prompt'])
+    llm_result = pooled_llm_generate(user_input, CONFIG['llm']['system_prompt'], session_id)
     
     if 'error' in llm_result:
         return jsonify(llm_result), 500
     
     response_text = llm_result['text']
     
+    if binary:
+        # テキストを先に送り、音声は合成後に続けて送る
+        def generate_parts():
+            tts_result = pooled_tts_or_error(response_text)
+            yield "application/json; charset=utf-8", json.dumps({
+                "input": user_input,
+                "response": response_text,
+                "audio_format": tts_result.get('format', 'mp3')
+            }, ensure_ascii=False), None
+            if tts_result.get('audio') is not None:
+                yield audio_mimetype(tts_result['format'], tts_result.get('sample_rate')), tts_result['audio'], audio_headers(tts_result)
+        
+        return multipart_response(generate_parts())
+    
     # TTS（音声合成）
-    tts_result = tts_synthesize(response_text)
+    tts_result = tts_result_base64(pooled_tts_or_error(response_text))
     
     return jsonify({
         "input": user_input,
@@ -294,45 +946,254 @@ def chat_endpoint():
     })
 
 
+def preview_encoder():
+    """トラッカーのプレビューエンコーダ（無効ならNone）"""
+    return body_tracker.preview if body_tracker else None
+
+
+@app.route('/preview', methods=['GET'])
+def preview_stream():
+    """トラッキングカメラのMJPEGストリーム（CONFIG["tracking"]["preview"]で有効化）"""
+    preview = preview_encoder()
+    if not preview:
+        return jsonify({"error": "プレビュー無効"}), 404
+
+    frames = (("image/jpeg", jpeg, None) for jpeg in preview.frames())
+    return multipart_response(frames, "x-mixed-replace")
+
+
+@app.route('/preview.jpg', methods=['GET'])
+def preview_snapshot():
+    """トラッキングカメラの最新フレーム（JPEG1枚）"""
+    preview = preview_encoder()
+    if not preview:
+        return jsonify({"error": "プレビュー無効"}), 404
+
+    jpeg = preview.latest()
+    if jpeg is None:
+        return jsonify({"error": "フレームがありません"}), 503
+    return Response(jpeg, mimetype="image/jpeg", headers={"Cache-Control": "no-store"})
+
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def session_reset_endpoint(session_id):
+    """会話セッションの履歴を破棄する"""
+    return jsonify({"session_id": session_id, "reset": chat_sessions.reset(session_id)})
+
+
+def ensure_virtual_cam():
+    """仮想カメラが起動していなければ起動する（失敗時はNone）"""
+    global virtual_cam
+    if not virtual_cam:
+        camera = VirtualCamera()
+        if not camera.start():
+            return None
+        virtual_cam = camera
+    return virtual_cam
+
+
+def layer_params(args):
+    """クエリパラメータから合成レイヤーの設定（x, y, scale, z, opacity）を読む"""
+    params = {}
+    for name, cast in (("x", int), ("y", int), ("scale", float), ("z", int), ("opacity", float)):
+        if name in args:
+            params[name] = cast(args[name])
+    if "scale" in params and params["scale"] <= 0:
+        raise ValueError("scale must be positive")
+    if "opacity" in params:
+        params["opacity"] = min(max(params["opacity"], 0.0), 1.0)
+    return params
+
+
+@app.route('/stream/layers/<name>', methods=['PUT'])
+def stream_layer_put(name):
+    """
+    仮想カメラに静的レイヤー（背景・オーバーレイ画像）を置く
+    本文: 画像（JPEG/PNG。PNGの透過はそのまま合成）
+    クエリ: x, y, scale, z, opacity
+    """
+    try:
+        params = layer_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not request.data:
+        return jsonify({"error": "画像がありません"}), 400
+
+    camera = ensure_virtual_cam()
+    if not camera:
+        return jsonify({"error": "仮想カメラを起動できません"}), 503
+    if not camera.set_static_layer(name, request.data, **params):
+        return jsonify({"error": "画像をデコードできません"}), 400
+    return jsonify({"layer": name, "layers": camera.stats()["layers"]})
+
+
+@app.route('/stream/layers/<name>', methods=['DELETE'])
+def stream_layer_delete(name):
+    """仮想カメラのレイヤーを取り除く"""
+    removed = virtual_cam.remove_layer(name) if virtual_cam else False
+    return jsonify({"layer": name, "removed": removed})
+
+
 @sock.route('/stream')
 def stream_socket(ws):
-    """ブラウザからの映像フレームを受信するWebSocket"""
-    global virtual_cam
-    
+    """
+    ブラウザからの映像フレームを受信するWebSocket
+    クエリ: source（レイヤー名。省略時 "main"）, x, y, scale, z, opacity
+    複数のクライアントが別々のsourceで接続すると、z順に重ねて出力する
+    """
+    try:
+        params = layer_params(request.args)
+    except ValueError as e:
+        print(f"[WARN] Invalid stream parameters: {e}")
+        ws.close()
+        return
+    source = request.args.get("source", "main")
+
     # 仮想カメラが起動していない場合は起動
-    if not virtual_cam:
-        virtual_cam = VirtualCamera()
-        if not virtual_cam.start():
-            # 起動失敗した場合
-            ws.close()
-            return
+    camera = ensure_virtual_cam()
+    if not camera:
+        # 起動失敗した場合
+        ws.close()
+        return
+    # パラメータがなくてもレイヤーとして登録する（2つ目のソースが来たら合成に切り替わる）
+    camera.configure_source(source, **params)
 
-    print("🔌 WebSocket: 映像ストリーム接続")
+    print(f"🔌 WebSocket: 映像ストリーム接続 ({source})")
     
     try:
         while True:
-            # バイナリデータ(JPEG/PNG)を受信
+            # バイナリデータ(JPEG/PNG/無圧縮)を受信
             data = ws.receive()
             if data:
-                virtual_cam.send_frame(data)
+                camera.send_frame(data, source)
                 
     except Exception as e:
         print(f"[WARN] WebSocket disconnected: {e}")
     finally:
-        pass
-        # 接続が切れてもカメラは維持する（再接続のため）
+        # 接続が切れてもカメラ（とメインのレイヤー）は維持する（再接続のため）
+        if source != "main":
+            camera.remove_layer(source)
+
+
+@sock.route('/chat/stream')
+def chat_stream_socket(ws):
+    """ストリーミングチャット用WebSocket
+    
+    受信: {"text": "...", "session_id": "..."(任意)}
+    送信: start → sentence（文ごとのテキスト、直後に音声のバイナリフレーム）... → done
+    """
+    print("🔌 WebSocket: チャットストリーム接続")
+    
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            
+            try:
+                data = json.loads(message)
+            except (TypeError, ValueError):
+                ws.send(json.dumps({"type": "error", "error": "JSONが不正です"}, ensure_ascii=False))
+                continue
+            
+            if not isinstance(data, dict) or 'text' not in data:
+                ws.send(json.dumps({"type": "error", "error": "textが必要です"}, ensure_ascii=False))
+                continue
+            
+            try:
+                events = chat_stream_events(data['text'], data.get('session_id'))
+            except PoolBusyError as e:
+                ws.send(json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False))
+                continue
+            
+            try:
+                for event in events:
+                    # 音声はJSON(Base64)ではなくバイナリフレームで続けて送る
+                    audio = event.pop("audio", None)
+                    ws.send(event_to_json(event))
+                    if audio is not None:
+                        ws.send(audio)
+            finally:
+                events.close()
+    
+    except Exception as e:
+        print(f"[WARN] Chat WebSocket disconnected: {e}")
 
 
 
 def check_ollama_status():
     """Ollamaが起動しているか確認"""
     try:
-        response = requests.get(f"{CONFIG['llm']['url']}/api/tags", timeout=3)
+        response = http_session.get(f"{CONFIG['llm']['url']}/api/tags", timeout=3)
         return response.status_code == 200
     except:
         return False
 
 
+# 依存サービスの状態確認（/healthはこの結果を返す）
+health_prober = HealthProber({"llm": check_ollama_status}, interval=CONFIG["serving"]["health_interval"])
+
+
+def init_llm():
+    """Ollamaの確認（以降はstart_servicesで始めたhealth_proberが定期確認する）"""
+    if health_prober.check("llm"):
+        print(f"[OK] Ollama connection OK: {CONFIG['llm']['url']}")
+    else:
+        print(f"[WARN] Ollama is not running: {CONFIG['llm']['url']}")
+        print("   How to start: ollama serve")
+    return True
+
+
+def init_tracking():
+    """Body Trackerの初期化 & 起動（最初に映像が取れたカメラをそのまま使い続ける）"""
+    global body_tracker
+    
+    print("[LOAD] Body Tracking initializing...")
+    try:
+        from body_tracker import BodyTracker
+        
+        # ※ OpenSeeFaceとカメラが競合するため注意
+        tracker = BodyTracker(config=CONFIG["tracking"])
+        if not tracker.start():
+            print("[WARN] Body Tracking start failed (Camera busy?)")
+            return False
+    except Exception as e:
+        print(f"[ERROR] Body Tracking Error: {e}")
+        return False
+    
+    body_tracker = tracker
+    print("[OK] Body Tracking started")
+    return True
+
+
+# サブシステムの初期化（並列）
+startup = StartupOrchestrator()
+startup.register("stt", init_whisper)
+startup.register("tts", init_tts)
+startup.register("tts_cache", init_tts_cache, depends=("tts",))
+startup.register("llm", init_llm)
+startup.register("tracking", init_tracking)
+
+
+
+def start_services():
+    """サブシステムを並列に初期化し、Ollamaの定期確認を始める（完了は待たない。状態は/healthで確認できる）"""
+    startup.start_all(CONFIG["startup"]["preload"])
+    health_prober.start()
+
+
+def stop_services():
+    """終了時にバックグラウンドの処理を止める"""
+    health_prober.stop()
+    llm_pool.shutdown()
+    tts_pool.shutdown()
+    if stt_worker:
+        stt_worker.stop()
+    if body_tracker:
+        body_tracker.stop()
+    if virtual_cam:
+        virtual_cam.stop()
+
 # ===== メイン処理 =====
 
 if __name__ == '__main__':
@@ -342,51 +1203,15 @@ if __name__ == '__main__':
 +------------------------------------------+
 |  STT: Whisper (Local)                    |
 |  LLM: Ollama                             |
-|  TTS: gTTS (Google Text-to-Speech)       |
+|  TTS: gTTS / Piper (Local)               |
 |  Body: MediaPipe Holistic                |
 +------------------------------------------+
     """)
     
-    # Whisper初期化
-    if WHISPER_AVAILABLE:
-        init_whisper()
-    
-    # Ollama確認
-    if check_ollama_status():
-        print(f"[OK] Ollama connection OK: {CONFIG['llm']['url']}")
-    else:
-        print(f"[WARN] Ollama is not running: {CONFIG['llm']['url']}")
-        print("   How to start: ollama serve")
-    
-    # Body Tracker初期化 & 起動
-    print("[LOAD] Body Tracking initializing...")
-    try:
-        # Body Trackerを起動 (※ OpenSeeFaceとカメラが競合するため、デフォルトではOFFにします)
-        # ユーザー要望により有効化: カメラ競合に注意
-        body_tracker = BodyTracker()
-        if body_tracker.start():
-             print("[OK] Body Tracking started")
-        else:
-             print("[WARN] Body Tracking start failed (Camera busy?)")
-             body_tracker = None
-
-    except Exception as e:
-        print(f"[ERROR] Body Tracking Error: {e}")
-        body_tracker = None
-
-    except Exception as e:
-        print(f"⚠️ Body Tracking エラー: {e}")
-        body_tracker = None
-    
-    # Flask起動
+    # サーバー起動（サブシステムの初期化はリクエストを処理するプロセスで始める）
     print("\n[START] AI Service starting: http://localhost:5000\n")
-    try:
-        app.run(host='0.0.0.0', port=5000, debug=False)
-    finally:
-        # 終了時にBody Trackerを停止
-        if body_tracker:
-            body_tracker.stop()
-        if virtual_cam:
-            virtual_cam.stop()
-
-
+    run_server(
+        app, host='0.0.0.0', port=5000,
+        threads=CONFIG["serving"]["threads"], mode=CONFIG["serving"]["mode"],
+        on_start=start_services, on_stop=stop_services
+    )
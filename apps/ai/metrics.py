@@ -0,0 +1,158 @@
+"""
+処理段ごとの所要時間メトリクス
+各段の処理時間をヒストグラム（累積バケット）と直近サンプルの分位点で集計し、
+Prometheusのテキスト形式で出力する
+
+段の名前: tracker_capture / tracker_convert / tracker_detect / tracker_pnp /
+tracker_osc_send / tracker_latency / stt_decode / stt_whisper / llm /
+llm_first_token / tts / vcam_decode / vcam_convert / vcam_resize / vcam_send
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+METRIC_PREFIX = "vrabater"
+
+# ヒストグラムのバケット上限（秒）。1ms〜30sをカバーする
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """1段分の処理時間の集計（スレッドセーフ）
+
+    バケット数・合計・件数は起動からの累計、分位点は直近window件から計算する
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は+Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            self.recent.append(seconds)
+
+    def snapshot(self):
+        """(累積バケット, 件数, 合計, {分位点: 値}) を返す"""
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+            total = self.sum
+            recent = np.fromiter(self.recent, dtype=np.float64, count=len(self.recent))
+
+        cumulative = np.cumsum(counts).tolist()
+        quantiles = {}
+        if recent.size:
+            quantiles = dict(zip(QUANTILES, np.quantile(recent, QUANTILES).tolist()))
+        return cumulative, count, total, quantiles
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}  # name -> (help, callback)
+        self.lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def register_gauge(self, name, help_text, callback):
+        """/metrics 出力時にcallback()の値（数値）を読むゲージを登録する"""
+        with self.lock:
+            self.gauges[name] = (help_text, callback)
+
+    def _items(self):
+        with self.lock:
+            return sorted(self.histograms.items()), sorted(self.gauges.items())
+
+    def summary(self):
+        """段ごとの件数と分位点（ミリ秒）の辞書（/health用）"""
+        result = {}
+        histograms, _ = self._items()
+        for stage, histogram in histograms:
+            _, count, _, quantiles = histogram.snapshot()
+            entry = {"count": count}
+            for q, value in quantiles.items():
+                entry[f"p{int(q * 100)}_ms"] = round(value * 1000, 2)
+            result[stage] = entry
+        return result
+
+    def render_prometheus(self):
+        """Prometheusのテキスト形式（version 0.0.4）で出力する"""
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        quantile_name = f"{METRIC_PREFIX}_stage_duration_quantile_seconds"
+        lines = [
+            f"# HELP {name} Processing time per pipeline stage.",
+            f"# TYPE {name} histogram",
+        ]
+        quantile_lines = [
+            f"# HELP {quantile_name} Latency quantiles over the most recent samples per stage.",
+            f"# TYPE {quantile_name} gauge",
+        ]
+
+        histograms, gauges = self._items()
+        for stage, histogram in histograms:
+            cumulative, count, total, quantiles = histogram.snapshot()
+            for bound, value in zip(histogram.buckets, cumulative):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {value}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+            for q, value in quantiles.items():
+                quantile_lines.append(f'{quantile_name}{{stage="{stage}",quantile="{q}"}} {value}')
+
+        lines.extend(quantile_lines)
+
+        for gauge, (help_text, callback) in gauges:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            gauge_name = f"{METRIC_PREFIX}_{gauge}"
+            lines.append(f"# HELP {gauge_name} {help_text}")
+            lines.append(f"# TYPE {gauge_name} gauge")
+            lines.append(f"{gauge_name} {float(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def observe(stage, seconds):
+    """段の処理時間（秒）を記録する"""
+    REGISTRY.observe(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """with timed("stage"): ... で囲んだ区間の時間を記録する"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(stage, time.perf_counter() - start)
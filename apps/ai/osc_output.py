@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+from pythonosc import udp_client
+from pythonosc.osc_bundle_builder import OscBundleBuilder
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+from metrics import timed
+
+
+class OSCFrameSender:
+    """Sends each tracking frame as one timestamped OSC bundle.
+
+    Values that moved less than the dead-band since they were last sent are
+    skipped, and state messages (add_state) only go out when they change.
+    Continuous values are still re-sent at least once per keyframe interval so a
+    receiver that restarted or lost a packet catches up.
+    """
+
+    def __init__(self, host, port, deadband=0.002, keyframe_interval=1.0):
+        self.client = udp_client.UDPClient(host, port)
+        self.deadband = deadband
+        self.keyframe_interval = keyframe_interval
+
+        self._last_sent = {}  # address -> (values, send_time)
+        self._blocks = {}     # addresses tuple -> (last values (n, k), send times (n,))
+        self._messages = []
+        self._frame_time = 0.0
+
+        self.bundles_sent = 0
+        self.messages_sent = 0
+        self.messages_suppressed = 0
+
+    def begin_frame(self, timestamp=None):
+        """Start collecting messages for a frame (timestamp: Unix time of the capture)"""
+        self._messages = []
+        self._frame_time = timestamp if timestamp is not None else time.time()
+
+    def add(self, address, values, deadband=None, keyframe=True):
+        """Queue a continuous value; skipped if within the dead-band of the last sent value"""
+        values = tuple(float(v) for v in values)
+        threshold = self.deadband if deadband is None else deadband
+
+        last = self._last_sent.get(address)
+        if last is not None and (not keyframe or self._frame_time - last[1] < self.keyframe_interval):
+            if max(abs(a - b) for a, b in zip(values, last[0])) <= threshold:
+                self.messages_suppressed += 1
+                return
+        self._queue(address, values)
+
+    def add_many(self, addresses, values, mask=None, deadband=None):
+        """Queue a block of continuous values with a vectorized dead-band check.
+
+        addresses: tuple of n addresses (the same tuple every frame)
+        values: (n, k) array; mask: optional (n,) bool array of rows allowed to be sent
+        """
+        values = np.asarray(values, dtype=np.float64)
+        threshold = self.deadband if deadband is None else deadband
+
+        block = self._blocks.get(addresses)
+        if block is None:
+            block = (np.full(values.shape, np.nan), np.full(len(addresses), -np.inf))
+            self._blocks[addresses] = block
+        last_values, last_times = block
+
+        # NaN (never sent) compares as changed
+        changed = ~np.all(np.abs(values - last_values) <= threshold, axis=1)
+        stale = self._frame_time - last_times >= self.keyframe_interval
+        send = changed | stale
+        if mask is not None:
+            self.messages_suppressed += int(np.count_nonzero(mask & ~send))
+            send &= mask
+        else:
+            self.messages_suppressed += int(np.count_nonzero(~send))
+
+        rows = np.flatnonzero(send)
+        for i, row in zip(rows, values[rows].tolist()):
+            self._messages.append((addresses[i], tuple(row)))
+        last_values[rows] = values[rows]
+        last_times[rows] = self._frame_time
+
+    def add_state(self, address, values):
+        """Queue a discrete value that is only sent when it changes"""
+        self.add(address, values, deadband=0.0, keyframe=False)
+
+    def send_frame(self):
+        """Send the collected messages as one bundle (nothing is sent for an empty frame)"""
+        if not self._messages:
+            return
+
+        with timed("tracker_osc_send"):
+            bundle = OscBundleBuilder(self._frame_time)
+            for address, values in self._messages:
+                message = OscMessageBuilder(address=address)
+                for value in values:
+                    message.add_arg(value, OscMessageBuilder.ARG_TYPE_FLOAT)
+                bundle.add_content(message.build())
+            self.client.send(bundle.build())
+
+        self.bundles_sent += 1
+        self.messages_sent += len(self._messages)
+        self._messages = []
+
+    def stats(self):
+        return {
+            "bundles": self.bundles_sent,
+            "messages": self.messages_sent,
+            "suppressed": self.messages_suppressed,
+        }
+
+    def _queue(self, address, values):
+        self._messages.append((address, values))
+        self._last_sent[address] = (values, self._frame_time)
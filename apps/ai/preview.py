@@ -0,0 +1,159 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Pose landmark connections drawn on the preview (torso, arms, legs, face outline)
+PREVIEW_CONNECTIONS = [
+    (11, 12), (11, 23), (12, 24), (23, 24),
+    (11, 13), (13, 15), (12, 14), (14, 16),
+    (23, 25), (25, 27), (24, 26), (26, 28),
+    (0, 2), (0, 5), (9, 10),
+]
+
+
+def draw_landmarks(image, points, min_visibility=0.5):
+    """Draw pose landmarks (normalized to the full frame) onto a BGR image in place"""
+    h, w = image.shape[:2]
+    pixels = np.rint(points[:, :2] * (w, h)).astype(np.int32)
+    visible = points[:, 3] >= min_visibility
+    for a, b in PREVIEW_CONNECTIONS:
+        if visible[a] and visible[b]:
+            cv2.line(image, tuple(pixels[a]), tuple(pixels[b]), (0, 255, 0), 2)
+    for x, y in pixels[visible]:
+        cv2.circle(image, (int(x), int(y)), 3, (0, 0, 255), -1)
+    return image
+
+
+class PreviewEncoder:
+    """JPEG preview of the tracking camera, encoded on its own thread.
+
+    The tracking loop calls publish() for every frame; it returns immediately
+    unless a viewer is waiting and the preview rate allows another frame, in
+    which case the frame is copied into a reused buffer. Resizing, landmark
+    drawing and JPEG encoding happen on the encoder thread, so the tracking
+    thread never blocks on them. Nothing is encoded while nobody is watching.
+    """
+
+    def __init__(self, fps=10, quality=70, max_width=640, draw_landmarks=True):
+        self.interval = 1.0 / fps if fps else 0.0
+        self.quality = quality
+        self.max_width = max_width
+        self.draw_landmarks = draw_landmarks
+
+        self.running = False
+        self.thread = None
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)  # tracking thread -> encoder
+        self._new_jpeg = threading.Condition(self._lock)   # encoder -> viewers
+        self._frame = None  # written by publish()
+        self._work = None   # owned by the encoder thread
+        self._points = None
+        self._fresh = False
+        self._last_publish = 0.0
+
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._viewers = 0
+
+        self.encoded_frames = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self._lock:
+            self.running = False
+            self._new_frame.notify_all()
+            self._new_jpeg.notify_all()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    @property
+    def active(self):
+        return self._viewers > 0
+
+    def publish(self, frame, points=None):
+        """Offer a frame from the tracking loop (cheap no-op without viewers)"""
+        if not self._viewers:
+            return
+        now = time.perf_counter()
+        if now - self._last_publish < self.interval:
+            return
+
+        with self._lock:
+            if self._frame is None or self._frame.shape != frame.shape:
+                self._frame = np.empty_like(frame)
+            np.copyto(self._frame, frame)
+            self._points = None if points is None else points.copy()
+            self._fresh = True
+            self._last_publish = now
+            self._new_frame.notify()
+
+    def latest(self, timeout=2.0):
+        """Newest JPEG, encoding a fresh one if none is available yet. None on timeout."""
+        with self._lock:
+            seq = self._jpeg_seq
+            if self._jpeg is not None and time.perf_counter() - self._last_publish < max(self.interval, 0.5):
+                return self._jpeg
+            self._viewers += 1
+            try:
+                self._new_jpeg.wait_for(lambda: self._jpeg_seq != seq or not self.running, timeout)
+                return self._jpeg
+            finally:
+                self._viewers -= 1
+
+    def frames(self, timeout=2.0):
+        """Yield JPEGs as they are encoded (one generator per connected viewer)"""
+        with self._lock:
+            self._viewers += 1
+            seq = self._jpeg_seq
+        try:
+            while self.running:
+                with self._lock:
+                    if not self._new_jpeg.wait_for(lambda: self._jpeg_seq != seq or not self.running, timeout):
+                        continue
+                    seq = self._jpeg_seq
+                    jpeg = self._jpeg
+                if jpeg is not None:
+                    yield jpeg
+        finally:
+            with self._lock:
+                self._viewers -= 1
+
+    def stats(self):
+        return {"viewers": self._viewers, "encoded": self.encoded_frames}
+
+    def _encode_loop(self):
+        while True:
+            with self._lock:
+                self._new_frame.wait_for(lambda: self._fresh or not self.running)
+                if not self.running:
+                    return
+                # Swap buffers so publish() never waits for the encode
+                self._work, self._frame = self._frame, self._work
+                points = self._points
+                self._fresh = False
+
+            image = self._work
+            h, w = image.shape[:2]
+            if self.max_width and w > self.max_width:
+                size = (self.max_width, max(1, int(h * self.max_width / w)))
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+            if self.draw_landmarks and points is not None:
+                draw_landmarks(image, points)
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                continue
+
+            with self._lock:
+                self._jpeg = encoded.tobytes()
+                self._jpeg_seq += 1
+                self.encoded_frames += 1
+                self._new_jpeg.notify_all()
@@ -0,0 +1,262 @@
+import argparse
+import json
+import queue
+import struct
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# File layout:
+#   MAGIC, uint32 metadata length, metadata (UTF-8 JSON)
+#   records: kind (b"F" frame / b"L" landmarks), uint32 frame sequence,
+#            float64 seconds since the first frame, uint32 payload length, payload
+# Frame payloads are JPEG; landmark payloads are (33, 4) float32 normalized to the
+# full frame, or empty when nothing was detected.
+MAGIC = b"VRREC\x01"
+RECORD_HEADER = struct.Struct("<cIdI")
+FRAME = b"F"
+LANDMARKS = b"L"
+LANDMARK_SHAPE = (33, 4)
+
+
+class RecordingWriter:
+    """Records tracker input frames and landmark outputs to a compact file.
+
+    The tracking loop only copies the frame into a queue; JPEG encoding and file
+    writes happen on a writer thread. If the writer falls behind, frames are left
+    out of the recording (together with their landmarks) instead of stalling the loop.
+    With record_frames=False only the landmarks are written (e.g. when replaying,
+    where the frames are already in the input recording).
+    """
+
+    def __init__(self, path, jpeg_quality=90, record_frames=True, max_queue=60):
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self.record_frames = record_frames
+        self.max_queue = max_queue
+        self.queue = queue.Queue()
+        self.thread = None
+
+        self._file = None
+        self._lock = threading.Lock()  # write_landmarks may run on the detector's callback thread
+        self._start_time = None
+        self._frame_seq = {}  # capture_time -> frame sequence, until its landmarks are written
+        self._next_seq = 0
+
+        self.frames_dropped = 0
+
+    def open(self, metadata=None):
+        self._file = open(self.path, "wb")
+        header = json.dumps({"created": time.time(), **(metadata or {})}).encode("utf-8")
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+        print(f"[OK] Recording to {self.path}")
+
+    def close(self):
+        if not self.thread:
+            return
+        # The writer thread drains the queue and closes the file after the sentinel
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self._file = None
+        print(f"[OK] Recording saved: {self._next_seq} frames ({self.frames_dropped} dropped)")
+
+    def write_frame(self, frame, capture_time):
+        """Queue a frame read by the tracking loop (capture_time: perf_counter seconds)"""
+        if self.record_frames and self.queue.qsize() >= self.max_queue:
+            self.frames_dropped += 1
+            return
+        with self._lock:
+            if self._start_time is None:
+                self._start_time = capture_time
+            seq = self._next_seq
+            self._next_seq += 1
+            self._frame_seq[capture_time] = seq
+        if self.record_frames:
+            self.queue.put((FRAME, seq, capture_time - self._start_time, frame.copy()))
+
+    def write_landmarks(self, capture_time, points):
+        """Queue the landmarks detected in the frame captured at capture_time (None = no detection)"""
+        with self._lock:
+            seq = self._frame_seq.pop(capture_time, None)
+            # Forget frames whose detection never reported back
+            for stale in [t for t in self._frame_seq if t < capture_time]:
+                del self._frame_seq[stale]
+        if seq is None:
+            return  # the frame itself was not recorded
+        payload = b"" if points is None else np.asarray(points, dtype=np.float32).tobytes()
+        self.queue.put((LANDMARKS, seq, capture_time - self._start_time, payload))
+
+    def _write_loop(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                kind, seq, timestamp, payload = item
+                if kind == FRAME:
+                    ok, encoded = cv2.imencode(".jpg", payload, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    if not ok:
+                        continue
+                    payload = encoded.tobytes()
+                self._file.write(RECORD_HEADER.pack(kind, seq, timestamp, len(payload)))
+                self._file.write(payload)
+        finally:
+            self._file.close()
+
+
+def read_records(path):
+    """Yield (kind, seq, timestamp, payload) from a recording; returns the metadata first"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a tracking recording: {path}")
+        (length,) = struct.unpack("<I", f.read(4))
+        yield json.loads(f.read(length).decode("utf-8"))
+
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return  # end of file (or a truncated last record)
+            kind, seq, timestamp, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield kind, seq, timestamp, payload
+
+
+def iter_frames(path):
+    """Yield (seq, timestamp, jpeg_bytes) for every recorded frame"""
+    records = read_records(path)
+    next(records)
+    for kind, seq, timestamp, payload in records:
+        if kind == FRAME:
+            yield seq, timestamp, payload
+
+
+def load_landmarks(path):
+    """{frame seq: (33, 4) array or None} of the recorded landmark outputs"""
+    records = read_records(path)
+    next(records)
+    landmarks = {}
+    for kind, seq, _, payload in records:
+        if kind == LANDMARKS:
+            landmarks[seq] = np.frombuffer(payload, dtype=np.float32).reshape(LANDMARK_SHAPE) if payload else None
+    return landmarks
+
+
+def recording_info(path):
+    records = read_records(path)
+    metadata = next(records)
+    frames = detections = misses = 0
+    duration = 0.0
+    for kind, _, timestamp, payload in records:
+        duration = max(duration, timestamp)
+        if kind == FRAME:
+            frames += 1
+        elif payload:
+            detections += 1
+        else:
+            misses += 1
+    return {"metadata": metadata, "frames": frames, "detections": detections, "misses": misses, "duration": duration}
+
+
+def diff_landmarks(expected, actual, tolerance=1e-3):
+    """Compare two landmark recordings frame by frame (x, y, z only).
+
+    Returns a summary dict; "equal" is True when every frame present in both has
+    the same detection state and no coordinate differs by more than tolerance.
+    """
+    common = sorted(set(expected) & set(actual))
+    detection_mismatches = []
+    errors = []
+    over_tolerance = []
+    for seq in common:
+        a, b = expected[seq], actual[seq]
+        if (a is None) != (b is None):
+            detection_mismatches.append(seq)
+            continue
+        if a is None:
+            continue
+        error = float(np.max(np.abs(a[:, :3] - b[:, :3])))
+        errors.append(error)
+        if error > tolerance:
+            over_tolerance.append(seq)
+
+    return {
+        "frames": len(common),
+        "only_expected": len(set(expected) - set(actual)),
+        "only_actual": len(set(actual) - set(expected)),
+        "detection_mismatches": detection_mismatches,
+        "over_tolerance": over_tolerance,
+        "max_error": max(errors) if errors else 0.0,
+        "mean_error": float(np.mean(errors)) if errors else 0.0,
+        "equal": not detection_mismatches and not over_tolerance,
+    }
+
+
+def replay(path, output=None, realtime=False):
+    """Run a recording through BodyTracker (VIDEO mode) and return throughput statistics"""
+    from body_tracker import BodyTracker
+    from metrics import REGISTRY
+
+    tracker = BodyTracker(config={
+        "replay": {"path": path, "realtime": realtime},
+        "record": {"path": output, "frames": False},
+    })
+    start = time.perf_counter()
+    if not tracker.start():
+        raise RuntimeError(f"Could not replay {path}")
+    try:
+        while tracker.running:
+            time.sleep(0.05)
+    finally:
+        tracker.stop()
+    elapsed = time.perf_counter() - start
+
+    frames = tracker.source.stats()["captured"]
+    return {
+        "recording": path,
+        "realtime": realtime,
+        "frames": frames,
+        "elapsed": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "stages": REGISTRY.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record/replay tools for the body tracker")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info_parser = commands.add_parser("info", help="summarize a recording")
+    info_parser.add_argument("recording")
+
+    replay_parser = commands.add_parser("replay", help="run a recording through the tracker")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--output", help="record the replayed landmarks to this file")
+    replay_parser.add_argument("--realtime", action="store_true", help="pace frames by their timestamps")
+
+    diff_parser = commands.add_parser("diff", help="compare the landmark outputs of two recordings")
+    diff_parser.add_argument("expected")
+    diff_parser.add_argument("actual")
+    diff_parser.add_argument("--tolerance", type=float, default=1e-3)
+
+    args = parser.parse_args(argv)
+    if args.command == "info":
+        result = recording_info(args.recording)
+    elif args.command == "replay":
+        result = replay(args.recording, args.output, args.realtime)
+    else:
+        result = diff_landmarks(load_landmarks(args.expected), load_landmarks(args.actual), args.tolerance)
+
+    print(json.dumps(result, indent=2))
+    return 0 if result.get("equal", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
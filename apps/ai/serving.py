@@ -0,0 +1,308 @@
+"""
+本番サービング
+- HealthProber: 依存サービス（Ollama等）の状態をバックグラウンドで確認してキャッシュする
+- CallPool: LLM・TTS・STTなど時間のかかる呼び出しを上限付きのスレッドプールで実行し、
+  タイムアウトしたら打ち切る（リクエストスレッドを長時間占有しない）
+- run_server: POSIXでgunicornがあればgthreadワーカー、なければWerkzeugのスレッドサーバーで起動する
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class CallTimeoutError(Exception):
+    """呼び出しが制限時間内に終わらなかった（504で返す）"""
+
+
+class PoolBusyError(Exception):
+    """実行中・待機中の呼び出しが上限に達している（503で返す）"""
+
+
+class HealthProber:
+    """
+    依存サービスの状態をinterval秒ごとに確認し、最新の結果を保持する
+    probes: {名前: 呼び出し可能（Trueなら正常）}
+    /health はキャッシュを読むだけなので、確認のタイムアウトを待たされない
+    """
+
+    def __init__(self, probes, interval=5.0):
+        self.probes = dict(probes)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self._stop = threading.Event()
+        self._results = {}  # name -> {"ok", "checked_at", "latency_ms", "error"}
+
+    def start(self):
+        if self.thread:
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def check(self, name):
+        """1つのサービスを今すぐ確認して結果を返す"""
+        start = time.perf_counter()
+        error = None
+        try:
+            ok = bool(self.probes[name]())
+        except Exception as e:
+            ok, error = False, str(e)
+        self._store(name, ok, (time.perf_counter() - start) * 1000, error)
+        return ok
+
+    def report(self, name, ok, error=None):
+        """実際の呼び出しで分かった状態を反映する（次の定期確認を待たずに切り替わる）"""
+        self._store(name, ok, None, error)
+
+    def ok(self, name):
+        """最後に確認した状態（未確認ならFalse）"""
+        with self.lock:
+            result = self._results.get(name)
+        return bool(result and result["ok"])
+
+    def snapshot(self):
+        """サービスごとの状態と、確認してからの経過秒数"""
+        now = time.time()
+        with self.lock:
+            return {
+                name: dict(result, age=round(now - result["checked_at"], 3))
+                for name, result in self._results.items()
+            }
+
+    def _store(self, name, ok, latency_ms, error):
+        with self.lock:
+            previous = self._results.get(name)
+            self._results[name] = {
+                "ok": ok,
+                "checked_at": time.time(),
+                "latency_ms": round(latency_ms, 2) if latency_ms is not None else None,
+                "error": error,
+            }
+        if previous is not None and previous["ok"] != ok:
+            state = "available" if ok else "unavailable"
+            print(f"[{'OK' if ok else 'WARN'}] {name} is {state}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            for name in self.probes:
+                self.check(name)
+            self._stop.wait(self.interval)
+
+
+class CallPool:
+    """
+    時間のかかる呼び出しを専用スレッドで実行する（同時実行max_workers、待機max_pendingまで）
+    funcは第1引数にキャンセル用のthreading.Eventを受け取る。タイムアウト時はEventを立て、
+    未着手ならキャンセルする（実行中の処理はEventを見て打ち切るか、終わるまで裏で続く）
+    """
+
+    def __init__(self, name, max_workers=4, max_pending=8):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+        self.capacity = threading.BoundedSemaphore(max_workers + max_pending)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.active = 0
+        self._lock = threading.Lock()
+
+        # 統計
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def call(self, func, timeout=None):
+        """func(cancel_event)を実行して結果を返す（PoolBusyError / CallTimeoutError）"""
+        cancel_event, future = self._submit(func)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            cancel_event.set()
+            future.cancel()
+            self.timeouts += 1
+            raise CallTimeoutError(f"{self.name}: {timeout}秒以内に終わりませんでした")
+        self.completed += 1
+        return result
+
+    def stream(self, func, timeout=None):
+        """
+        func(cancel_event)が返すイテレータをプールのスレッドで回し、要素を順に返すClosingStreamを返す
+        枠が空いていなければこの呼び出しの時点でPoolBusyError、開始からtimeout秒を超えたら
+        反復中にCallTimeoutErrorを送出する。funcの例外も反復中に送出される。
+        close()（クライアント切断など）でcancel_eventを立てて生成を打ち切る。一度も反復して
+        いなくても同じなので、呼び出し側は必ずcloseすること
+        """
+        items = queue.Queue()
+
+        def produce(cancel_event):
+            iterator = None
+            try:
+                iterator = func(cancel_event)
+                for item in iterator:
+                    if cancel_event.is_set():
+                        break
+                    items.put((True, item))
+            except BaseException as e:
+                items.put((False, e))
+            else:
+                items.put((False, None))
+            finally:
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+
+        cancel_event, future = self._submit(produce)
+        def cancel():
+            cancel_event.set()
+            future.cancel()
+
+        return ClosingStream(self._consume(items, cancel_event, future, timeout), cancel)
+
+    def _consume(self, items, cancel_event, future, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    if deadline is None:
+                        ok, value = items.get()
+                    else:
+                        ok, value = items.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self.timeouts += 1
+                    raise CallTimeoutError(f"{self.name}: {timeout}秒以内に終わりませんでした")
+                if ok:
+                    yield value
+                elif value is None:
+                    self.completed += 1
+                    return
+                else:
+                    raise value
+        finally:
+            cancel_event.set()
+            future.cancel()
+
+    def _submit(self, func):
+        """枠を取ってfunc(cancel_event)を投入する（枠は処理が終わったときに返す）"""
+        if not self.capacity.acquire(blocking=False):
+            self.rejected += 1
+            raise PoolBusyError(f"{self.name}: 処理待ちが上限に達しています")
+
+        cancel_event = threading.Event()
+
+        def run():
+            with self._lock:
+                self.active += 1
+            try:
+                return func(cancel_event)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        try:
+            future = self.executor.submit(run)
+        except BaseException:
+            self.capacity.release()
+            raise
+        # 枠は実際に処理が終わったときに返す（タイムアウト後も裏で動いている分は数える）
+        future.add_done_callback(lambda _: self.capacity.release())
+        return cancel_event, future
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+class ClosingStream:
+    """
+    ジェネレータを包むイテレータ。close()すると反復を始めていなくてもon_close()を呼ぶ
+    （未着手のジェネレータはcloseしてもfinallyが動かないため、後始末をここで確実に行う）
+    """
+
+    def __init__(self, generator, on_close):
+        self._generator = generator
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._generator)
+
+    def close(self):
+        try:
+            self._generator.close()
+        finally:
+            self._on_close()
+
+
+def gunicorn_available():
+    if os.name != "posix":
+        return False
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_server(app, host="0.0.0.0", port=5000, threads=32, mode="auto", on_start=None, on_stop=None):
+    """
+    HTTPサーバーを起動する（ブロッキング）
+    mode: auto（使えればgunicorn） / gunicorn / werkzeug
+    WebSocket（/stream等）は接続中スレッドを1本占有するため、threadsは同時接続数より多めにする。
+    モデル・カメラはプロセス内で共有しているのでワーカープロセスは1つだけ
+
+    on_start / on_stop: リクエストを処理するプロセスで、起動時・終了時に呼ぶ関数。
+    バックグラウンドスレッドはforkしたワーカーに引き継がれないので、スレッドを使う
+    初期化は必ずon_startで行う（gunicornではpost_worker_init・worker_exitで呼ぶ）
+    """
+    if mode != "werkzeug" and gunicorn_available():
+        from gunicorn.app.base import BaseApplication
+
+        class Application(BaseApplication):
+            def load_config(self):
+                self.cfg.set("bind", f"{host}:{port}")
+                self.cfg.set("workers", 1)
+                self.cfg.set("worker_class", "gthread")
+                self.cfg.set("threads", threads)
+                self.cfg.set("timeout", 0)  # WebSocket・ストリーミング応答を切らない
+                self.cfg.set("keepalive", 5)
+                if on_start:
+                    self.cfg.set("post_worker_init", lambda worker: on_start())
+                if on_stop:
+                    self.cfg.set("worker_exit", lambda server, worker: on_stop())
+
+            def load(self):
+                return app
+
+        print(f"[OK] Serving with gunicorn (gthread, {threads} threads)")
+        Application().run()
+        return
+
+    if mode == "gunicorn":
+        print("[WARN] gunicorn is not available, using the threaded development server")
+    if on_start:
+        on_start()
+    try:
+        app.run(host=host, port=port, debug=False, threaded=True)
+    finally:
+        if on_stop:
+            on_stop()
@@ -0,0 +1,119 @@
+"""
+起動オーケストレーター
+サブシステム（STT・TTS・LLM・トラッキング等）の初期化を別スレッドで並列に進め、
+それぞれの状態を記録する。HTTPサーバーは初期化の完了を待たずに起動できる
+
+依存関係のあるサブシステムは依存先の完了を待ってから初期化する。
+起動時に始めなかったサブシステムは、最初に使われたときにensure()で初期化を始める
+"""
+
+import threading
+import time
+
+# サブシステムの状態
+STOPPED = "stopped"     # まだ初期化していない
+STARTING = "starting"   # 初期化中
+READY = "ready"
+FAILED = "failed"
+
+
+class Subsystem:
+    def __init__(self, name, init, depends=()):
+        self.name = name
+        self.init = init
+        self.depends = tuple(depends)
+        self.state = STOPPED
+        self.error = None
+        self.elapsed = None
+        self.done = threading.Event()
+
+
+class StartupOrchestrator:
+    def __init__(self):
+        self.subsystems = {}
+        self.lock = threading.Lock()
+        self.created_at = time.perf_counter()
+
+    def register(self, name, init, depends=()):
+        """
+        サブシステムを登録する
+        init: 初期化関数（Falseを返すか例外を送出したら失敗）
+        depends: 先に初期化しておくサブシステム名
+        """
+        self.subsystems[name] = Subsystem(name, init, depends)
+
+    def start(self, name):
+        """サブシステム（と依存先）の初期化をバックグラウンドで始める（開始済みなら何もしない）"""
+        subsystem = self.subsystems[name]
+        with self.lock:
+            if subsystem.state != STOPPED:
+                return
+            subsystem.state = STARTING
+        for dependency in subsystem.depends:
+            self.start(dependency)
+        threading.Thread(target=self._run, args=(subsystem,), name=f"startup-{name}", daemon=True).start()
+
+    def start_all(self, names=None):
+        for name in names if names is not None else list(self.subsystems):
+            self.start(name)
+
+    def ensure(self, name, timeout=0):
+        """
+        サブシステムが使えるか（未初期化なら初期化を始め、timeout秒まで完了を待つ）
+        未登録の名前はTrue（起動管理の対象外）
+        """
+        subsystem = self.subsystems.get(name)
+        if subsystem is None:
+            return True
+        self.start(name)
+        if timeout:
+            subsystem.done.wait(timeout)
+        return subsystem.state == READY
+
+    def state(self, name):
+        subsystem = self.subsystems.get(name)
+        return subsystem.state if subsystem else None
+
+    def wait(self, names=None, timeout=None):
+        """開始済みのサブシステムの初期化が終わるまで待つ。すべて終わればTrue"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names if names is not None else list(self.subsystems):
+            subsystem = self.subsystems[name]
+            if subsystem.state == STOPPED:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not subsystem.done.wait(remaining):
+                return False
+        return True
+
+    def status(self):
+        """サブシステムごとの状態と初期化にかかった時間（/health用）"""
+        return {
+            name: {
+                "state": subsystem.state,
+                "elapsed": round(subsystem.elapsed, 3) if subsystem.elapsed is not None else None,
+                "error": subsystem.error,
+            }
+            for name, subsystem in self.subsystems.items()
+        }
+
+    def _run(self, subsystem):
+        start = time.perf_counter()
+        try:
+            for dependency in subsystem.depends:
+                self.subsystems[dependency].done.wait()
+                if self.subsystems[dependency].state != READY:
+                    raise RuntimeError(f"{dependency} is not available")
+            ok = subsystem.init() is not False
+            error = None if ok else "initialization failed"
+        except Exception as e:
+            ok, error = False, str(e)
+
+        subsystem.elapsed = time.perf_counter() - start
+        subsystem.error = error
+        subsystem.state = READY if ok else FAILED
+        subsystem.done.set()
+        if ok:
+            print(f"[OK] {subsystem.name} ready ({subsystem.elapsed:.2f}s)")
+        else:
+            print(f"[WARN] {subsystem.name} unavailable: {error}")
@@ -0,0 +1,138 @@
+"""
+ストリーミング音声認識用のVAD（音声区間検出）
+連続したPCMチャンクから発話区間を切り出し、途中結果(partial)と確定結果(final)のタイミングを決める
+"""
+
+import numpy as np
+
+from audio_io import to_float32, resample, WHISPER_SAMPLE_RATE
+
+
+class EnergyVAD:
+    """フレームごとのRMSエネルギーと適応ノイズフロアによる軽量VAD"""
+
+    def __init__(self, sample_rate, frame_ms=30, threshold_ratio=3.0, min_rms=0.01, noise_adapt=0.05):
+        self.sample_rate = sample_rate
+        self.frame_len = max(1, int(sample_rate * frame_ms / 1000))
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.noise_adapt = noise_adapt
+        self.noise_floor = min_rms / threshold_ratio
+        self._remainder = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples):
+        """
+        samples: float32のモノラル音声
+        戻り値: (フレーム配列 (n, frame_len), 発話フラグ (n,))
+        """
+        audio = np.concatenate((self._remainder, samples)) if self._remainder.size else samples
+        n_frames = audio.size // self.frame_len
+        used = n_frames * self.frame_len
+        self._remainder = audio[used:].copy()
+
+        frames = audio[:used].reshape(n_frames, self.frame_len)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+
+        is_speech = np.empty(n_frames, dtype=bool)
+        for i, level in enumerate(rms):
+            threshold = max(self.min_rms, self.noise_floor * self.threshold_ratio)
+            is_speech[i] = level > threshold
+            if not is_speech[i]:
+                # 無音フレームでのみノイズフロアを追従させる
+                self.noise_floor += self.noise_adapt * (level - self.noise_floor)
+
+        return frames, is_speech
+
+
+class UtteranceSegmenter:
+    """VADの結果から発話区間をまとめ、partial/finalイベントを発行する"""
+
+    def __init__(self, sample_rate, frame_ms=30, threshold_ratio=3.0, min_rms=0.01,
+                 pre_roll_ms=200, min_speech_ms=200, end_silence_ms=500,
+                 partial_interval=1.0, max_utterance=15.0):
+        self.sample_rate = sample_rate
+        self.vad = EnergyVAD(sample_rate, frame_ms, threshold_ratio, min_rms)
+        frame_sec = self.vad.frame_len / sample_rate
+
+        self.pre_roll_frames = int(pre_roll_ms / 1000 / frame_sec)
+        self.min_speech_frames = max(1, int(min_speech_ms / 1000 / frame_sec))
+        self.end_silence_frames = max(1, int(end_silence_ms / 1000 / frame_sec))
+        # partial_intervalが0以下・Noneなら途中結果を出さない
+        self.partial_interval_frames = (
+            max(1, int(partial_interval / frame_sec)) if partial_interval and partial_interval > 0 else None
+        )
+        self.max_utterance_frames = int(max_utterance / frame_sec)
+
+        self._pre_roll = []
+        self._frames = []
+        self._in_speech = False
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._last_partial = 0
+
+    def feed(self, pcm_bytes):
+        """int16 PCMのチャンクを受け取り、発生したイベントのリストを返す"""
+        usable = len(pcm_bytes) - (len(pcm_bytes) % 2)
+        samples = to_float32(np.frombuffer(pcm_bytes[:usable], dtype=np.int16))
+        return self.feed_samples(samples)
+
+    def feed_samples(self, samples):
+        """
+        float32のチャンクを受け取り、発生したイベントのリストを返す
+        イベント: ("start", None) / ("partial", audio) / ("final", audio)
+        audioはWhisper用のfloat32 (16kHz)
+        """
+        events = []
+        frames, is_speech = self.vad.process(samples)
+
+        for frame, speech in zip(frames, is_speech):
+            if not self._in_speech:
+                self._pre_roll.append(frame)
+                if len(self._pre_roll) > self.pre_roll_frames + self.min_speech_frames:
+                    self._pre_roll.pop(0)
+
+                self._speech_frames = self._speech_frames + 1 if speech else 0
+                if self._speech_frames >= self.min_speech_frames:
+                    # 発話開始（直前の無音も少し含める）
+                    self._in_speech = True
+                    self._frames = self._pre_roll
+                    self._pre_roll = []
+                    self._silence_frames = 0
+                    self._last_partial = len(self._frames)
+                    events.append(("start", None))
+                continue
+
+            self._frames.append(frame)
+            self._silence_frames = 0 if speech else self._silence_frames + 1
+
+            if self._silence_frames >= self.end_silence_frames or len(self._frames) >= self.max_utterance_frames:
+                events.append(("final", self._take_audio()))
+            elif (self.partial_interval_frames is not None
+                  and len(self._frames) - self._last_partial >= self.partial_interval_frames):
+                self._last_partial = len(self._frames)
+                events.append(("partial", self._utterance_audio()))
+
+        return events
+
+    def flush(self):
+        """残っている発話を確定させる（ストリーム終了時）"""
+        if self._in_speech and self._frames:
+            return [("final", self._take_audio())]
+        return []
+
+    def _utterance_audio(self):
+        audio = np.concatenate(self._frames)
+        return np.ascontiguousarray(resample(audio, self.sample_rate, WHISPER_SAMPLE_RATE), dtype=np.float32)
+
+    def _take_audio(self):
+        # 末尾の無音は認識に不要なので落とす
+        if self._silence_frames:
+            del self._frames[-self._silence_frames:]
+        audio = self._utterance_audio() if self._frames else np.zeros(0, dtype=np.float32)
+
+        self._frames = []
+        self._in_speech = False
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._last_partial = 0
+        return audio
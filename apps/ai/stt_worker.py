@@ -0,0 +1,196 @@
+"""
+STT推論ワーカー
+Whisperモデルを専用スレッドで保持し、有界キューから受け取ったリクエストをまとめて(マイクロバッチ)推論する
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from metrics import timed
+
+# Whisperの1回のデコード窓（これ以下の音声はバッチデコードできる）
+BATCH_MAX_SECONDS = 30.0
+WHISPER_SAMPLE_RATE = 16000
+
+
+class STTBusyError(Exception):
+    """キューが満杯、または待ち時間が上限を超えた（503で返す）"""
+
+    def __init__(self, message, queue_depth):
+        super().__init__(message)
+        self.queue_depth = queue_depth
+
+
+class _Job:
+    __slots__ = ("audio", "future", "deadline", "enqueued_at")
+
+    def __init__(self, audio, deadline):
+        self.audio = audio
+        self.future = Future()
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+
+
+class STTWorker:
+    def __init__(self, model, language="ja", max_queue=8, max_batch=4, batch_window=0.02, max_wait=15.0):
+        self.model = model
+        self.language = language
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_wait = max_wait
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.running = False
+        self.thread = None
+        self.in_flight = 0
+
+        # 統計
+        self.processed = 0
+        self.batches = 0
+        self.rejected = 0
+        self.expired = 0
+        self.errors = 0
+
+    def start(self):
+        """ワーカースレッドを開始"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        print(f"[OK] STT worker started (queue={self.queue.maxsize}, batch={self.max_batch})")
+
+    def stop(self):
+        """ワーカースレッドを停止"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def submit(self, audio):
+        """
+        音声(float32, 16kHz)を投入し、結果のFutureを返す
+        キューが満杯ならSTTBusyErrorを送出する
+        """
+        job = _Job(audio, time.monotonic() + self.max_wait)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            self.rejected += 1
+            raise STTBusyError("STTキューが満杯です", self.queue_depth)
+        return job.future
+
+    def transcribe(self, audio, timeout=None):
+        """
+        投入して結果を待つ（ブロッキング）
+        timeout秒で結果が出なければ、未着手のジョブは取り消してconcurrent.futures.TimeoutErrorを送出する
+        """
+        future = self.submit(audio)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_max": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "errors": self.errors,
+        }
+
+    def _collect_batch(self):
+        """先頭ジョブを待ち、batch_window内に届いたジョブをmax_batchまでまとめる"""
+        try:
+            first = self.queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        window_end = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = window_end - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # 待ち時間の上限を超えたジョブは推論せずに捨てる（負荷制限）
+            now = time.monotonic()
+            live = []
+            for job in batch:
+                if now > job.deadline:
+                    self.expired += 1
+                    job.future.set_exception(STTBusyError("STTの待ち時間が上限を超えました", self.queue_depth))
+                elif job.future.set_running_or_notify_cancel():
+                    live.append(job)
+            if not live:
+                continue
+
+            self.in_flight = len(live)
+            short = [job for job in live if job.audio.size <= BATCH_MAX_SECONDS * WHISPER_SAMPLE_RATE]
+            long = [job for job in live if job.audio.size > BATCH_MAX_SECONDS * WHISPER_SAMPLE_RATE]
+
+            if len(short) > 1:
+                self._run_batch(short)
+            else:
+                long = short + long
+
+            for job in long:
+                self._run_single(job)
+
+            self.in_flight = 0
+
+    def _run_single(self, job):
+        try:
+            with timed("stt_whisper"):
+                result = self.model.transcribe(job.audio, language=self.language, fp16=False)
+            job.future.set_result({"text": result["text"], "language": result["language"]})
+            self.processed += 1
+        except Exception as e:
+            self.errors += 1
+            job.future.set_exception(e)
+        self.batches += 1
+
+    def _run_batch(self, jobs):
+        """30秒以下の音声をまとめて1回のデコードで処理する"""
+        try:
+            import torch
+            import whisper
+
+            mels = [
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(job.audio), n_mels=self.model.dims.n_mels)
+                for job in jobs
+            ]
+            mel = torch.stack(mels).to(self.model.device)
+            options = whisper.DecodingOptions(language=self.language, fp16=False, without_timestamps=True)
+            with timed("stt_whisper"):
+                results = whisper.decode(self.model, mel, options)
+        except Exception as e:
+            # バッチデコードに失敗したら1件ずつ処理する
+            print(f"[WARN] STT batch decode failed, falling back: {e}")
+            for job in jobs:
+                self._run_single(job)
+            return
+
+        for job, result in zip(jobs, results):
+            job.future.set_result({"text": result.text, "language": result.language})
+        self.processed += len(jobs)
+        self.batches += 1
@@ -0,0 +1,213 @@
+"""
+TTSキャッシュ
+テキスト・言語・話速・ピッチから作ったハッシュをキーに、合成済み音声を
+メモリ(LRU)とディスク(LRU、ファイルの更新時刻で順序を保つ)の2段でキャッシュする
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class TTSCache:
+    def __init__(self, max_memory_bytes=32 * 1024 * 1024, cache_dir=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes  # Noneなら無制限
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+
+        # メモリ層: key -> {"audio": bytes, "format": str, "base64": str|None}
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+
+        # ディスク層: key -> (ファイルパス, サイズ)。古い順（起動時に一度だけ走査）
+        self._disk_index = OrderedDict()
+        self._disk_bytes = 0
+
+        # 統計
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(text, lang, speed, pitch, engine="gtts"):
+        """合成条件からキャッシュキー(SHA-256)を作る"""
+        payload = json.dumps([engine, lang, float(speed), float(pitch), text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _scan_disk(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(name)
+            if ext and len(key) == 64:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, key, path, st.st_size))
+
+        for _, key, path, size in sorted(files):
+            self._disk_index[key] = (path, size)
+            self._disk_bytes += size
+        self._remove_files(self._evict_disk())
+
+    def get(self, key):
+        """キャッシュを引く（メモリ → ディスク）。なければNone"""
+        with self.lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+            path = self._disk_index.get(key, (None, 0))[0]
+
+        if path:
+            try:
+                with open(path, "rb") as f:
+                    audio = f.read()
+                os.utime(path)  # 再起動後もLRUの順序を保つ
+            except OSError:
+                with self.lock:
+                    self._forget_disk(key)
+            else:
+                with self.lock:
+                    if key in self._disk_index:
+                        self._disk_index.move_to_end(key)
+                entry = self._make_entry(audio, os.path.splitext(path)[1][1:])
+                with self.lock:
+                    self.disk_hits += 1
+                    self._store_memory(key, entry)
+                return entry
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, audio, audio_format):
+        """合成結果を両方の層に保存し、エントリを返す"""
+        entry = self._make_entry(audio, audio_format)
+        with self.lock:
+            self._store_memory(key, entry)
+
+        if self.cache_dir and key not in self._disk_index:
+            path = os.path.join(self.cache_dir, f"{key}.{audio_format}")
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, path)
+                with self.lock:
+                    self._forget_disk(key)
+                    self._disk_index[key] = (path, len(audio))
+                    self._disk_bytes += len(audio)
+                    evicted = self._evict_disk()
+                self._remove_files(evicted)
+            except OSError as e:
+                print(f"[WARN] TTS cache write failed: {e}")
+        return entry
+
+    def get_or_synthesize(self, key, synthesize):
+        """
+        キャッシュになければsynthesize()で合成して保存する
+        synthesize: () -> (audio_bytes, format)
+        戻り値: (entry, cache_hit)
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry, True
+
+        audio, audio_format = synthesize()
+        return self.put(key, audio, audio_format), False
+
+    def prewarm(self, items, synthesize):
+        """
+        よく使うフレーズを事前に合成しておく
+        items: [(key, text), ...] / synthesize: (text) -> (audio_bytes, format)
+        """
+        warmed = 0
+        for key, text in items:
+            if self.get(key) is not None:
+                continue
+            try:
+                audio, audio_format = synthesize(text)
+                self.put(key, audio, audio_format)
+                warmed += 1
+            except Exception as e:
+                print(f"[WARN] TTS prewarm failed ({text[:20]}): {e}")
+        return warmed
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    @staticmethod
+    def _make_entry(audio, audio_format):
+        return {"audio": audio, "format": audio_format, "base64": None}
+
+    @staticmethod
+    def _memory_size(entry):
+        """メモリ層での1エントリの大きさ（後からentry_base64で保持するBase64文字列の分も含める）"""
+        size = len(entry["audio"])
+        return size + 4 * ((size + 2) // 3)
+
+    def _store_memory(self, key, entry):
+        """メモリ層に保存し、上限を超えた分を古い順に追い出す（lock内で呼ぶ）"""
+        size = self._memory_size(entry)
+        if size > self.max_memory_bytes:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= self._memory_size(old)
+
+        self._memory[key] = entry
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= self._memory_size(evicted)
+
+    def _forget_disk(self, key):
+        """ディスク層の索引からキーを外す（lock内で呼ぶ）"""
+        _, size = self._disk_index.pop(key, (None, 0))
+        self._disk_bytes -= size
+
+    def _evict_disk(self):
+        """上限を超えた分を古い順に索引から外し、削除するファイルのリストを返す（lock内で呼ぶ）"""
+        evicted = []
+        while self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes and self._disk_index:
+            key, (path, _) = next(iter(self._disk_index.items()))
+            self._forget_disk(key)
+            evicted.append(path)
+        return evicted
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def entry_base64(entry):
+    """エントリの音声をBase64文字列で返す（JSON応答用。一度だけエンコードして保持）"""
+    if entry.get("base64") is None:
+        entry["base64"] = base64.b64encode(entry["audio"]).decode("utf-8")
+    return entry["base64"]
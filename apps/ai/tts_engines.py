@@ -0,0 +1,132 @@
+"""
+TTSエンジン
+CONFIG["tts"]["engine"] で選択する音声合成バックエンドの登録と生成
+"""
+
+import io
+import os
+import wave
+
+TTS_ENGINES = {}
+
+
+def register_engine(name):
+    """TTSエンジンを名前で登録するデコレータ"""
+    def decorator(cls):
+        cls.name = name
+        TTS_ENGINES[name] = cls
+        return cls
+    return decorator
+
+
+def create_engine(name, config):
+    """登録済みのエンジンを生成し、モデルを読み込む"""
+    if name not in TTS_ENGINES:
+        raise ValueError(f"Unknown TTS engine: {name} (available: {', '.join(TTS_ENGINES)})")
+    engine = TTS_ENGINES[name](config)
+    engine.load()
+    return engine
+
+
+class TTSEngine:
+    """TTSエンジンの基底クラス"""
+
+    name = None
+    audio_format = None  # "mp3" / "wav" / "pcm"
+    stream_format = None  # synthesize_streamが返すチャンクの形式
+    sample_rate = None   # PCM/WAVのサンプリングレート（不明ならNone）
+
+    def __init__(self, config):
+        self.config = config
+
+    def load(self):
+        """モデルなどの初期化（起動時に一度だけ呼ばれる）"""
+
+    def synthesize(self, text):
+        """テキストを合成し (音声バイナリ, 形式) を返す"""
+        raise NotImplementedError
+
+    def synthesize_stream(self, text):
+        """生成された順に音声チャンクを返すジェネレータ（既定は一括合成）"""
+        audio, _ = self.synthesize(text)
+        yield audio
+
+
+@register_engine("gtts")
+class GTTSEngine(TTSEngine):
+    """Google Text-to-Speech（要ネットワーク、MP3出力）"""
+
+    audio_format = "mp3"
+    stream_format = "mp3"
+
+    def load(self):
+        from gtts import gTTS
+        self._gtts = gTTS
+
+    def synthesize(self, text):
+        tts = self._gtts(text=text, lang=self.config.get("lang", "ja"), slow=False)
+
+        # メモリ上のバッファに保存
+        audio_buffer = io.BytesIO()
+        tts.write_to_fp(audio_buffer)
+        return audio_buffer.getvalue(), self.audio_format
+
+
+@register_engine("piper")
+class PiperEngine(TTSEngine):
+    """Piper（オフライン、音声モデルは常駐）。WAVまたは生PCM (int16 mono) を出力"""
+
+    stream_format = "pcm"
+
+    def load(self):
+        from piper.voice import PiperVoice
+
+        piper_config = self.config.get("piper", {})
+        model_path = piper_config.get("model")
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"Piper voice model not found: {model_path}")
+
+        self.voice = PiperVoice.load(model_path, config_path=piper_config.get("config"))
+        self.sample_rate = self.voice.config.sample_rate
+        self.audio_format = piper_config.get("output", "wav")
+        self.speaker_id = piper_config.get("speaker_id")
+        # 話速1.1 → 音素長を短く
+        self.length_scale = 1.0 / self.config.get("speed", 1.0)
+        # piper-tts 1.3以降は synthesize(text, SynthesisConfig) がAudioChunkを返す。1.2系は synthesize_stream_raw
+        self._syn_config = None
+        if not hasattr(self.voice, "synthesize_stream_raw"):
+            from piper import SynthesisConfig
+            self._syn_config = SynthesisConfig(speaker_id=self.speaker_id, length_scale=self.length_scale)
+        # 一度合成してみる（APIが合わなければここで失敗し、gTTSにフォールバックさせる）
+        if not b"".join(self._synthesize_raw("テスト")):
+            raise RuntimeError("Piper returned no audio")
+        print(f"[OK] Piper voice loaded: {os.path.basename(model_path)} ({self.sample_rate}Hz)")
+
+    def synthesize(self, text):
+        pcm = b"".join(self._synthesize_raw(text))
+        if self.audio_format == "pcm":
+            return pcm, "pcm"
+        return self._to_wav(pcm), "wav"
+
+    def synthesize_stream(self, text):
+        """文ごとの生PCMチャンクを生成された順に返す"""
+        yield from self._synthesize_raw(text)
+
+    def _synthesize_raw(self, text):
+        """文ごとの生PCM (int16 mono) を返すイテレータ"""
+        if self._syn_config is None:
+            return self.voice.synthesize_stream_raw(
+                text,
+                speaker_id=self.speaker_id,
+                length_scale=self.length_scale,
+            )
+        return (chunk.audio_int16_bytes for chunk in self.voice.synthesize(text, syn_config=self._syn_config))
+
+    def _to_wav(self, pcm):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(pcm)
+        return buffer.getvalue()
@@ -2,19 +2,279 @@
 import pyvirtualcam
 import numpy as np
 import cv2
+import struct
 import threading
-import time
+
+from metrics import timed
+
+# JPEGの縮小デコード（1/2, 1/4, 1/8）。大きい順に試す
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# 無圧縮フレーム: ヘッダ（マジック, バージョン, 画素形式, 幅, 高さ）＋画素データ
+RAW_FRAME_MAGIC = b"VRAW"
+RAW_FRAME_HEADER = struct.Struct("<4sBBHH")
+RAW_FORMAT_RGBA = 0
+RAW_FORMAT_BGR = 1
+RAW_FORMAT_I420 = 2
+
+# SOFマーカー（0xC0〜0xCF のうちDHT/JPG/DACを除く）
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """JPEGのSOFヘッダから (幅, 高さ) を読む。JPEGでなければNone"""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1  # フィルバイト
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    return None
+
+
+def raw_frame_view(frame_data):
+    """
+    無圧縮フレームの画素をコピーせずにndarrayとして参照する
+    戻り値: (画素形式, ndarray)。ヘッダやサイズが不正ならNone
+    """
+    if len(frame_data) < RAW_FRAME_HEADER.size:
+        return None
+    magic, version, pixel_format, width, height = RAW_FRAME_HEADER.unpack_from(frame_data)
+    if magic != RAW_FRAME_MAGIC or version != 1:
+        return None
+
+    if pixel_format == RAW_FORMAT_RGBA:
+        shape = (height, width, 4)
+    elif pixel_format == RAW_FORMAT_BGR:
+        shape = (height, width, 3)
+    elif pixel_format == RAW_FORMAT_I420 and width % 2 == 0 and height % 2 == 0:
+        shape = (height * 3 // 2, width)
+    else:
+        return None
+
+    size = int(np.prod(shape))
+    if len(frame_data) - RAW_FRAME_HEADER.size != size:
+        return None
+    pixels = np.frombuffer(frame_data, np.uint8, count=size, offset=RAW_FRAME_HEADER.size)
+    return pixel_format, pixels.reshape(shape)
+
+
+class Layer:
+    """合成する1枚のレイヤー（ソース）。位置・倍率は出力画像に対する値"""
+
+    def __init__(self, name, x=0, y=0, scale=1.0, z=0, opacity=1.0, static=False):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.scale = scale
+        self.z = z
+        self.opacity = opacity
+        self.static = static  # 背景・オーバーレイなど、更新されない画像
+        self.seq = 0
+
+        # update()で作る合成用データ（出力画像からはみ出す部分は切り落とし済み）
+        self.region = None    # 出力画像上の (y0, y1, x0, x1)
+        self.pixels = None    # 不透明なら画素（BGR）をそのまま
+        self.premult = None   # 半透明なら 画素×α (uint16)
+        self.inv_alpha = None # 半透明なら 255−α (uint16)
+
+    def size(self, width, height):
+        """このレイヤーの画像サイズ（出力サイズ×scale）"""
+        return max(1, round(width * self.scale)), max(1, round(height * self.scale))
+
+
+class Compositor:
+    """
+    複数のソースをz順に重ねて1枚の出力画像にする
+    レイヤー画像は更新時に切り抜き・乗算済みαまで計算しておき、合成は領域ごとの
+    ベクトル演算だけで行う。最下層から続く静的レイヤーは合成結果ごとキャッシュする
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.layers = {}
+        self.lock = threading.Lock()
+        self._order = []       # z順（同じzなら追加順）
+        self._base = None      # 最下層の静的レイヤーを合成済みの画像
+        self._base_count = 0   # _baseに含まれるレイヤー数
+        self._scratch = np.empty((height, width, 3), np.uint16)
+
+    def configure(self, name, x=None, y=None, scale=None, z=None, opacity=None, static=None):
+        """レイヤーを作成・設定変更する（指定しなかった値はそのまま）"""
+        with self.lock:
+            layer = self.layers.get(name)
+            if layer is None:
+                layer = self.layers[name] = Layer(name)
+            changed = False
+            for attr, value in (("x", x), ("y", y), ("scale", scale), ("z", z), ("opacity", opacity), ("static", static)):
+                if value is not None and getattr(layer, attr) != value:
+                    setattr(layer, attr, value)
+                    changed = True
+            if changed:
+                # 位置・倍率が変わった画像は次のupdateまで使わない
+                layer.region = layer.pixels = layer.premult = layer.inv_alpha = None
+            self._reorder()
+            return layer
+
+    def remove(self, name):
+        with self.lock:
+            if self.layers.pop(name, None) is None:
+                return False
+            self._reorder()
+            return True
+
+    def target_size(self, name):
+        """ソースのデコード先サイズ"""
+        layer = self.layers.get(name) or Layer(name)
+        return layer.size(self.width, self.height)
+
+    def layer_names(self):
+        """レイヤー名（z順）"""
+        return list(self._order)
+
+    def is_passthrough(self, name):
+        """そのソースだけが登録されていて、全面・不透明で出す構成か（合成せずにデコード結果をそのまま出力できる）"""
+        layer = self.layers.get(name)
+        return (
+            len(self.layers) == 1 and layer is not None
+            and layer.x == 0 and layer.y == 0 and layer.scale == 1.0 and layer.opacity >= 1.0 and not layer.static
+        )
+
+    def update(self, name, image, seq=0):
+        """
+        レイヤーの画像を差し替える（imageはtarget_sizeのBGRまたはBGRA）
+        後から受信した画像がすでに反映されていればFalse
+        """
+        with self.lock:
+            layer = self.layers.get(name) or self.layers.setdefault(name, Layer(name))
+            if seq and seq < layer.seq:
+                return False
+            layer.seq = seq
+            self._prepare(layer, image)
+            if name not in self._order:
+                self._reorder()
+            elif layer.static:
+                self._base = None
+            return True
+
+    def compose(self, out):
+        """全レイヤーをoutに合成する（lockを持って呼ぶ）"""
+        if self._base is None:
+            self._build_base()
+        np.copyto(out, self._base)
+        for name in self._order[self._base_count:]:
+            self._blend(out, self.layers[name])
+        return out
+
+    def _reorder(self):
+        self._order = [layer.name for layer in sorted(self.layers.values(), key=lambda layer: layer.z)]
+        self._base = None
+
+    def _build_base(self):
+        """最下層から続く静的レイヤーを一度だけ合成しておく"""
+        base = np.zeros((self.height, self.width, 3), np.uint8)
+        count = 0
+        for name in self._order:
+            layer = self.layers[name]
+            if not layer.static:
+                break
+            self._blend(base, layer)
+            count += 1
+        self._base = base
+        self._base_count = count
+
+    def _prepare(self, layer, image):
+        """画像を出力画像の範囲に切り抜き、合成用のデータを作る"""
+        h, w = image.shape[:2]
+        x0, y0 = max(layer.x, 0), max(layer.y, 0)
+        x1, y1 = min(layer.x + w, self.width), min(layer.y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            layer.region = None  # 画面外
+            return
+        crop = image[y0 - layer.y:y1 - layer.y, x0 - layer.x:x1 - layer.x]
+        layer.region = (y0, y1, x0, x1)
+
+        has_alpha = crop.shape[2] == 4
+        if not has_alpha and layer.opacity >= 1.0:
+            layer.pixels = np.ascontiguousarray(crop)
+            layer.premult = layer.inv_alpha = None
+            return
+
+        if has_alpha:
+            alpha = crop[:, :, 3:4].astype(np.uint16)
+            if layer.opacity < 1.0:
+                alpha = (alpha * round(layer.opacity * 255) + 127) // 255
+        else:
+            alpha = np.full((y1 - y0, x1 - x0, 1), round(layer.opacity * 255), np.uint16)
+        layer.pixels = None
+        layer.premult = crop[:, :, :3] * alpha
+        layer.inv_alpha = 255 - alpha
+
+    def _blend(self, out, layer):
+        if layer.region is None:
+            return
+        y0, y1, x0, x1 = layer.region
+        target = out[y0:y1, x0:x1]
+        if layer.pixels is not None:
+            target[...] = layer.pixels
+            return
+        # out = (src×α + dst×(255−α)) / 255 を整数演算で（最大65025なのでuint16に収まる）
+        scratch = self._scratch[:y1 - y0, :x1 - x0]
+        np.multiply(target, layer.inv_alpha, out=scratch)
+        scratch += layer.premult
+        scratch += 127
+        scratch //= 255
+        target[...] = scratch
+
 
 class VirtualCamera:
-    def __init__(self, width=1280, height=720, fps=24):
+    def __init__(self, width=1280, height=720, fps=24, decode_workers=2):
         self.width = width
         self.height = height
         self.fps = fps
         self.cam = None
         self.running = False
         self.thread = None
-        self.current_frame = None
-        self.lock = threading.Lock()
+
+        # 出力バッファ: 出力ループが送信中のfront、最新の完成フレームready、
+        # 各ワーカーの書き込み先。受け渡しは参照の入れ替えだけで、送信中もロックを持たない
+        self._swap_lock = threading.Lock()
+        self._front = np.zeros((height, width, 3), np.uint8)  # 最初は黒画面
+        self._ready = None
+        self._ready_seq = 0       # readyになったフレームの番号
+        self._fresh = False       # readyが未送信
+
+        # 複数ソースの合成（ソースが1つで全面表示なら合成せずにそのまま出す）
+        self.compositor = Compositor(width, height)
+
+        # デコードワーカー: 未着手のフレームはソースごとに最新の1枚だけ保持する
+        self.decode_workers = decode_workers
+        self.decode_threads = []
+        self._decode_ready = threading.Condition(threading.Lock())
+        self._pending = {}        # source -> (seq, frame_data)
+        self._received_seq = 0
+
+        # 統計
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0   # デコード前に新しいフレームで置き換えられた
+        self.frames_stale = 0     # デコード中に新しいフレームが先に表示された
+        self.frames_fresh = 0     # 新しいフレームを出力した回数
+        self.frames_repeated = 0  # 新しいフレームがなく、前のフレームを再送した回数
 
     def start(self):
         """仮想カメラへの出力を開始"""
@@ -35,6 +295,11 @@ class VirtualCamera:
             self.running = True
             self.thread = threading.Thread(target=self._loop, daemon=True)
             self.thread.start()
+            self.decode_threads = [
+                threading.Thread(target=self._decode_loop, daemon=True) for _ in range(self.decode_workers)
+            ]
+            for thread in self.decode_threads:
+                thread.start()
             return True
         except Exception as e:
             print(f"❌ 仮想カメラの初期化に失敗: {e}")
@@ -43,57 +308,252 @@ class VirtualCamera:
 
     def stop(self):
         """仮想カメラへの出力を停止"""
-        self.running = False
+        with self._decode_ready:
+            self.running = False
+            self._decode_ready.notify_all()
         if self.thread:
             self.thread.join(timeout=1.0)
+        for thread in self.decode_threads:
+            thread.join(timeout=1.0)
+        self.decode_threads = []
         if self.cam:
             self.cam.close()
             self.cam = None
         print("🛑 仮想カメラ停止")
 
-    def send_frame(self, frame_data):
+    def add_source(self, source, x=None, y=None, scale=None, z=None, opacity=None, static=None):
+        """ソースをレイヤーとして登録・設定する（2つ目以降のソースが来たら合成に切り替わる）"""
+        if source not in self.compositor.layers:
+            self._seed_passthrough_source()
+        return self.compositor.configure(source, x, y, scale, z, opacity, static)
+
+    def send_frame(self, frame_data, source="main"):
         """
-        画像データ(バイナリ)を受け取り、OpenCV形式に変換してセットする
-        frame_data: bytes (JPEG/PNG encoded)
+        画像データ(バイナリ)を受け取り、デコードワーカーに渡す（受信スレッドはブロックしない）
+        frame_data: bytes (JPEG/PNG encoded、または無圧縮フレーム)
+        source: 合成レイヤー名（複数のWebSocketクライアントを重ねて出力できる）
+        まだデコードされていない古いフレームは捨て、最新のものだけをデコードする
         """
-        try:
-            # バイナリ -> numpy array
-            nparr = np.frombuffer(frame_data, np.uint8)
-            # デコード (BGR形式)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                return
+        if source not in self.compositor.layers:
+            self.add_source(source)
+        with self._decode_ready:
+            self._received_seq += 1
+            self.frames_received += 1
+            if source in self._pending:
+                self.frames_dropped += 1
+            self._pending[source] = (self._received_seq, frame_data)
+            self._decode_ready.notify()
 
-            # リサイズが必要な場合
-            if img.shape[1] != self.width or img.shape[0] != self.height:
-                img = cv2.resize(img, (self.width, self.height))
+    def configure_source(self, source, x=None, y=None, scale=None, z=None, opacity=None):
+        """ソースの位置・倍率・重なり順・不透明度を設定する（未登録なら登録する）"""
+        self.add_source(source, x, y, scale, z, opacity)
 
-            with self.lock:
-                self.current_frame = img
+    def set_static_layer(self, name, image_data, x=0, y=0, scale=1.0, z=0, opacity=1.0):
+        """背景・オーバーレイなど更新されない画像をレイヤーとして置く（PNGの透過も使える）"""
+        self.add_source(name, x, y, scale, z, opacity, static=True)
+        img = self.decode_frame(image_data, size=self.compositor.target_size(name), alpha=True)
+        if img is None:
+            self.compositor.remove(name)
+            return False
+        self.compositor.update(name, img)
+        self._recompose()
+        return True
 
-        except Exception as e:
-            print(f"⚠️ フレーム処理エラー: {e}")
+    def remove_layer(self, name):
+        """レイヤー（ソース・静的レイヤー）を取り除く"""
+        with self._decode_ready:
+            self._pending.pop(name, None)
+        removed = self.compositor.remove(name)
+        if removed:
+            self._recompose()
+        return removed
+
+    def decode_frame(self, frame_data, out=None, size=None, alpha=False):
+        """
+        画像データを指定サイズ（省略時は出力サイズ）のBGR画像に変換する（失敗時はNone）
+        出力より十分大きいJPEGは縮小デコード（IMREAD_REDUCED_*）でリサイズの手間を減らす
+        無圧縮フレーム（RAW_FRAME_MAGIC）はデコードせず、outがあればそこに直接変換する
+        alpha=Trueなら透過を持つ画像（PNG・RGBA）はBGRAで返す
+        """
+        width, height = size or (self.width, self.height)
+        if frame_data[:4] == RAW_FRAME_MAGIC:
+            return self.convert_raw_frame(frame_data, out, (width, height), alpha)
+
+        nparr = np.frombuffer(frame_data, np.uint8)
+        flags = cv2.IMREAD_UNCHANGED if alpha else cv2.IMREAD_COLOR
+        source_size = jpeg_size(frame_data)
+        if source_size is not None:
+            flags = cv2.IMREAD_COLOR
+            for scale, reduced_flag in REDUCED_DECODE_FLAGS:
+                if source_size[0] // scale >= width and source_size[1] // scale >= height:
+                    flags = reduced_flag
+                    break
+
+        # デコード (BGR形式)
+        with timed("vcam_decode"):
+            img = cv2.imdecode(nparr, flags)
+
+        if img is None:
+            return None
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        if img.dtype != np.uint8:
+            img = (img >> 8).astype(np.uint8)  # 16bit PNG
+
+        # リサイズが必要な場合
+        if img.shape[1] != width or img.shape[0] != height:
+            with timed("vcam_resize"):
+                img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+        return img
+
+    def convert_raw_frame(self, frame_data, out=None, size=None, alpha=False):
+        """無圧縮フレームを指定サイズのBGR(A)画像に変換する（コーデックを通さない）"""
+        raw = raw_frame_view(frame_data)
+        if raw is None:
+            print("⚠️ 不正な無圧縮フレーム")
+            return None
+        pixel_format, pixels = raw
+        target_width, target_height = size or (self.width, self.height)
+        if out is not None and out.shape[:2] != (target_height, target_width):
+            out = None
+
+        if pixel_format == RAW_FORMAT_BGR:
+            height, width = pixels.shape[:2]
+            if width == target_width and height == target_height:
+                return pixels  # 受信バッファをそのまま使う（読み取り専用）
+            img = pixels
+        else:
+            height = pixels.shape[0] * 2 // 3 if pixel_format == RAW_FORMAT_I420 else pixels.shape[0]
+            width = pixels.shape[1]
+            if pixel_format == RAW_FORMAT_I420:
+                code = cv2.COLOR_YUV2BGR_I420
+            else:
+                code = cv2.COLOR_RGBA2BGRA if alpha else cv2.COLOR_RGBA2BGR
+            if code == cv2.COLOR_RGBA2BGRA:
+                out = None  # 出力バッファは3チャンネル
+            same_size = width == target_width and height == target_height
+            with timed("vcam_convert"):
+                img = cv2.cvtColor(pixels, code, dst=out if same_size else None)
+            if same_size:
+                return img
+
+        with timed("vcam_resize"):
+            return cv2.resize(img, (target_width, target_height), dst=out, interpolation=cv2.INTER_AREA)
+
+    def stats(self):
+        return {
+            "received": self.frames_received,
+            "decoded": self.frames_decoded,
+            "dropped": self.frames_dropped,
+            "stale": self.frames_stale,
+            "sent_fresh": self.frames_fresh,
+            "sent_repeated": self.frames_repeated,
+            "layers": self.compositor.layer_names(),
+        }
+
+    def _publish(self, seq, img):
+        """
+        デコード済みフレームをreadyに置く（参照の入れ替えのみ）
+        戻り値: 呼び出し側が次の書き込み先に使ってよい配列（出力ループは参照していない）
+        """
+        with self._swap_lock:
+            if seq < self._ready_seq:
+                # 後から受信したフレームが先にデコードし終わった
+                self.frames_stale += 1
+                return img
+            previous, self._ready = self._ready, img
+            self._ready_seq = seq
+            self._fresh = True
+            self.frames_decoded += 1
+            return previous
+
+    def _recompose(self, out=None):
+        """現在のレイヤーで出力画像を作り直してreadyに置く（戻り値は_publishと同じ）"""
+        compositor = self.compositor
+        with compositor.lock:
+            if out is None:
+                out = np.empty((self.height, self.width, 3), np.uint8)
+            compositor.compose(out)
+            # 合成はlock内で順に行うので、最新の受信番号で出せば追い越しは起きない
+            return self._publish(self._received_seq, out)
+
+    def _seed_passthrough_source(self):
+        """
+        パススルー中のソースは合成用の画像を持っていない（古い画像のまま）ので、合成に
+        切り替わる前に直近の出力フレームを渡しておく（次のフレームまで黒くならないように）
+        """
+        names = self.compositor.layer_names()
+        if len(names) != 1 or not self.compositor.is_passthrough(names[0]):
+            return
+        with self._swap_lock:
+            # frontは出力ループしか書き換えない・readyは入れ替えられるだけなので、lock内でコピーすれば安全
+            latest = self._ready if self._fresh else self._front
+            frame = latest.copy()
+        self.compositor.update(names[0], frame)
+
+    def _is_output_buffer(self, buffer):
+        return (
+            buffer is not None and buffer.flags.writeable and buffer.flags.c_contiguous
+            and buffer.shape == (self.height, self.width, 3)
+        )
+
+    def _decode_loop(self):
+        """受信フレームのデコード（decode_workers本のスレッドで並列に動く）"""
+        # このワーカーの書き込み先（無圧縮フレームの変換・リサイズはここに直接書く）
+        back = np.empty((self.height, self.width, 3), np.uint8)
+        while True:
+            with self._decode_ready:
+                self._decode_ready.wait_for(lambda: self._pending or not self.running)
+                if not self.running:
+                    return
+                # 一番古いソースから処理する
+                source = min(self._pending, key=lambda name: self._pending[name][0])
+                seq, frame_data = self._pending.pop(source)
+
+            passthrough = self.compositor.is_passthrough(source)
+            try:
+                if passthrough:
+                    img = self.decode_frame(frame_data, back)
+                else:
+                    img = self.decode_frame(frame_data, size=self.compositor.target_size(source), alpha=True)
+            except Exception as e:
+                print(f"⚠️ フレーム処理エラー: {e}")
+                continue
+            if img is None:
+                continue
+
+            if passthrough:
+                # 手放したバッファの代わりに、出力ループが使い終わったものを受け取る
+                reusable = self._publish(seq, img)
+            else:
+                # レイヤー画像を差し替えて、全レイヤーをbackに合成する
+                if not self.compositor.update(source, img, seq):
+                    self.frames_stale += 1
+                    continue
+                img = back
+                reusable = self._recompose(back)
+
+            if img is back or reusable is img:
+                back = reusable if self._is_output_buffer(reusable) else np.empty_like(back)
 
     def _loop(self):
-        """定期的にフレームを仮想カメラに送るループ"""
+        """定期的にフレームを仮想カメラに送るループ（新しいフレームがなければ前のフレームを再送）"""
         print(f"🎥 仮想カメラ出力ループ開始")
         
-        # デフォルトの黒画面
-        blank_frame = np.zeros((self.height, self.width, 3), np.uint8)
-        
         while self.running:
-            start_time = time.time()
-
-            with self.lock:
-                if self.current_frame is not None:
-                    # 最新のフレームを送る
-                    self.cam.send(self.current_frame)
+            with self._swap_lock:
+                if self._fresh:
+                    # readyを送信用に取り、送信済みのfrontはワーカーに返す
+                    self._front, self._ready = self._ready, self._front
+                    self._fresh = False
+                    self.frames_fresh += 1
                 else:
-                    # フレームが来てないときは黒画面
-                    self.cam.send(blank_frame)
+                    self.frames_repeated += 1
+                frame = self._front
+
+            # 送信中はロックを持たない（ワーカーはその間も次のフレームを置ける）
+            with timed("vcam_send"):
+                self.cam.send(frame)
 
             # FPS制御
-            elapsed = time.time() - start_time
-            sleep_time = max(0, (1.0 / self.fps) - elapsed)
             self.cam.sleep_until_next_frame()
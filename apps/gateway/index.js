@@ -215,12 +215,9 @@ faceUdpServer.on('message', (msg, rinfo) => {
 
 // MediaPipe OSCメッセージハンドラ
 let oscPacketCount = 0;
-oscServerBody.on('message', (oscMsg) => {
-  oscPacketCount++;
-  if (oscPacketCount % 60 === 0) {
-    console.log(`📨 OSC Body Data: ${oscPacketCount} packets received`);
-  }
 
+// OSCメッセージ1件をtrackingDataに反映する
+function applyOscMessage(oscMsg) {
   // /body/shoulder/left/position x y z
   // /face/rotation x y z
   // /face/blendshapes ...
@@ -228,36 +225,63 @@ oscServerBody.on('message', (oscMsg) => {
   const address = oscMsg.address;
   const args = oscMsg.args;
 
-  try {
-    const parts = address.split('/');
-    // parts: ['', 'body', ...] or ['', 'face', ...]
+  const parts = address.split('/');
+  // parts: ['', 'body', ...] or ['', 'face', ...]
 
-    // Body Data
-    if (parts.length >= 4 && parts[1] === 'body') {
-      const part = parts[2]; // shoulder
-      const side = parts[3]; // left
+  // Body Data
+  if (parts.length >= 4 && parts[1] === 'body') {
+    const part = parts[2]; // shoulder
+    const side = parts[3]; // left
 
-      if (trackingData.body[part] && trackingData.body[part][side]) {
-        trackingData.body[part][side] = { x: args[0], y: args[1], z: args[2] };
-      }
+    if (trackingData.body[part] && trackingData.body[part][side]) {
+      trackingData.body[part][side] = { x: args[0], y: args[1], z: args[2] };
     }
+  }
 
-    // Face Data (from Holistic-based Python script)
-    else if (parts[1] === 'face') {
-      const type = parts[2];
+  // Face Data (from Holistic-based Python script)
+  else if (parts[1] === 'face') {
+    const type = parts[2];
 
-      if (type === 'rotation') {
-        // /face/rotation x y z
-        trackingData.headRotation = { x: args[0], y: args[1], z: args[2] };
-      }
-      // Add other face parts...
+    if (type === 'rotation') {
+      // /face/rotation x y z
+      trackingData.headRotation = { x: args[0], y: args[1], z: args[2] };
     }
+    // Add other face parts...
+  }
+}
 
-    // Broadcast immediately on OSC update (or throttle if too fast)
-    // Since OSC comes per-joint, maybe we should throttle/debounce?
-    // But trackingData handles cumulative updates. Let's just broadcast for simplicity now.
+// 単発メッセージ（バンドル外）は受信ごとに配信
+oscServerBody.on('message', (oscMsg, timeTag) => {
+  // バンドル内のメッセージはbundleハンドラでまとめて処理する
+  if (timeTag !== undefined) return;
+
+  oscPacketCount++;
+  if (oscPacketCount % 60 === 0) {
+    console.log(`📨 OSC Body Data: ${oscPacketCount} packets received`);
+  }
+
+  try {
+    applyOscMessage(oscMsg);
     broadcastToClients(trackingData);
+  } catch (err) {
+    console.error('OSC Parse Error:', err);
+  }
+});
+
+// トラッキング1フレーム分のバンドル: 全メッセージを反映してから1回だけ配信
+oscServerBody.on('bundle', (oscBundle) => {
+  oscPacketCount++;
+  if (oscPacketCount % 60 === 0) {
+    console.log(`📨 OSC Body Data: ${oscPacketCount} packets received`);
+  }
 
+  try {
+    oscBundle.packets.forEach((packet) => {
+      if (packet.address) {
+        applyOscMessage(packet);
+      }
+    });
+    broadcastToClients(trackingData);
   } catch (err) {
     console.error('OSC Parse Error:', err);
   }
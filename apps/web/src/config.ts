@@ -141,6 +141,8 @@ export const CONFIG = {
     enabled: false, // UI から切替
     serviceUrl: 'http://localhost:5000',
     streamUrl: 'ws://localhost:5000/stream',
+    // 仮想カメラへの送信形式（'raw': 無圧縮RGBA。同一マシンならエンコード/デコード不要で低遅延）
+    streamFormat: 'jpeg' as 'jpeg' | 'raw',
 
 
     // STT (Speech-to-Text)
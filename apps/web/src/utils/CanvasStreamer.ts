@@ -4,18 +4,28 @@
  * Canvasの内容を一定間隔でキャプチャし、WebSocketでバックエンドに送信する
  */
 
+export type StreamFormat = 'jpeg' | 'raw';
+
+// 無圧縮フレームのヘッダ（apps/ai/virtual_cam.py の RAW_FRAME_HEADER と同じ）
+// マジック "VRAW"(4) + バージョン(1) + 画素形式(1) + 幅(2) + 高さ(2)、リトルエンディアン
+const RAW_HEADER_SIZE = 10;
+const RAW_VERSION = 1;
+const RAW_FORMAT_RGBA = 0;
+
 export class CanvasStreamer {
     private canvas: HTMLCanvasElement;
     private wsUrl: string;
     private fps: number;
+    private format: StreamFormat;
     private ws: WebSocket | null = null;
     private intervalId: number | null = null;
     private isStreaming: boolean = false;
 
-    constructor(canvas: HTMLCanvasElement, wsUrl: string, fps: number = 24) {
+    constructor(canvas: HTMLCanvasElement, wsUrl: string, fps: number = 24, format: StreamFormat = 'jpeg') {
         this.canvas = canvas;
         this.wsUrl = wsUrl;
         this.fps = fps;
+        this.format = format;
     }
 
     /**
@@ -75,7 +85,11 @@ export class CanvasStreamer {
         const offScreen = document.createElement('canvas');
         offScreen.width = 1280;
         offScreen.height = 720;
-        const ctx = offScreen.getContext('2d', { alpha: false }); // Alpha不要で高速化
+        // Alpha不要で高速化。rawではgetImageDataを毎フレーム呼ぶためCPU側に置く
+        const ctx = offScreen.getContext('2d', { alpha: false, willReadFrequently: this.format === 'raw' });
+
+        // rawの送信バッファ（ヘッダは固定なので最初に一度だけ書く）
+        const rawFrame = this.format === 'raw' ? this.createRawFrame(offScreen.width, offScreen.height) : null;
 
         // 指定したFPSで画像を送信
         this.intervalId = window.setInterval(() => {
@@ -85,6 +99,15 @@ export class CanvasStreamer {
             // メインCanvasをオフスクリーンに描画（リサイズ）
             ctx.drawImage(this.canvas, 0, 0, offScreen.width, offScreen.height);
 
+            if (rawFrame) {
+                // 前のフレームが送信待ちなら捨てる（遅延を溜めない）
+                if (this.ws.bufferedAmount > 0) return;
+                const pixels = ctx.getImageData(0, 0, offScreen.width, offScreen.height).data;
+                rawFrame.set(pixels, RAW_HEADER_SIZE);
+                this.ws.send(rawFrame);
+                return;
+            }
+
             offScreen.toBlob((blob) => {
                 if (blob && this.ws && this.ws.readyState === WebSocket.OPEN) {
                     this.ws.send(blob);
@@ -93,6 +116,17 @@ export class CanvasStreamer {
         }, 1000 / this.fps);
     }
 
+    private createRawFrame(width: number, height: number): Uint8Array {
+        const frame = new Uint8Array(RAW_HEADER_SIZE + width * height * 4);
+        const header = new DataView(frame.buffer);
+        frame.set([0x56, 0x52, 0x41, 0x57], 0); // "VRAW"
+        header.setUint8(4, RAW_VERSION);
+        header.setUint8(5, RAW_FORMAT_RGBA);
+        header.setUint16(6, width, true);
+        header.setUint16(8, height, true);
+        return frame;
+    }
+
     public get isActive(): boolean {
         return this.isStreaming;
     }